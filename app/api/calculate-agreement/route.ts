@@ -1,24 +1,17 @@
 import { NextResponse } from 'next/server';
-import { spawn } from 'child_process';
-import { join } from 'path';
+import { runPythonTask } from '@/app/lib/python-worker';
 import fs from 'fs/promises';
+import os from 'os';
 import path from 'path';
+import { randomUUID } from 'crypto';
 
 export async function POST(req: Request): Promise<Response> {
-  const publicDir = path.join(process.cwd(), 'public');
-  const csvPath = path.join(publicDir, 'merged_analysis.csv');
+  // A file per request, so concurrent requests never read or delete each other's CSV
+  const csvPath = path.join(os.tmpdir(), `merged_analysis-${randomUUID()}.csv`);
   
   try {
     const data = await req.json();
-    
-    console.log('Current working directory:', process.cwd());
 
-    try {
-      await fs.access(publicDir);
-    } catch {
-      await fs.mkdir(publicDir, { recursive: true });
-    }
-    
     // Write CSV file with explicit encoding
     try {
       await fs.writeFile(csvPath, data.mergedCsv, {
@@ -32,62 +25,23 @@ export async function POST(req: Request): Promise<Response> {
       throw writeError;
     }
     
-    const pythonResult = await new Promise<Response>((resolve) => {
-      const pythonProcess = spawn('python', [
-        join(process.cwd(), 'new_agreement_score.py')
-      ]);
-
-      let result = '';
-      let error = '';
-
-      pythonProcess.stdout.on('data', (data) => {
-        result += data.toString();
-      });
-
-      pythonProcess.stderr.on('data', (data) => {
-        const errorStr = data.toString();
-        console.error('Python stderr:', errorStr);
-        error += errorStr;
-      });
-
-      pythonProcess.on('close', async (code) => {
-        console.log('Python process exited with code:', code);
-        
-        try {
-          await fs.unlink(csvPath);
-        } catch (e) {
-          console.error('Failed to clean up CSV file:', e);
-        }
-
-        if (code !== 0) {
-          console.error('Python error:', error);
-          resolve(NextResponse.json(
-            { error: `Python process exited with code ${code}: ${error}` },
-            { status: 500 }
-          ));
-          return;
-        }
-
-        try {
-          const parsedResult = JSON.parse(result);
-          resolve(NextResponse.json(parsedResult));
-        } catch (e) {
-          console.error("Failed to parse Python output:", result); 
-          resolve(NextResponse.json(
-            { error: `Failed to parse Python output: ${e}` },
-            { status: 500 }
-          ));
-        }        
-      });
-
-      pythonProcess.on('error', (err) => {
-        console.error('Python process error:', err);
-        resolve(NextResponse.json(
-          { error: `Failed to start Python process: ${err.message}` },
-          { status: 500 }
-        ));
-      });
-    });
+    let pythonResult: Response;
+    try {
+      const agreement = await runPythonTask<Record<string, unknown>>('calculate_agreement', { csvPath });
+      pythonResult = NextResponse.json(agreement);
+    } catch (e) {
+      console.error('Python error:', e);
+      pythonResult = NextResponse.json(
+        { error: `Python agreement task failed: ${e instanceof Error ? e.message : e}` },
+        { status: 500 }
+      );
+    } finally {
+      try {
+        await fs.unlink(csvPath);
+      } catch (e) {
+        console.error('Failed to clean up CSV file:', e);
+      }
+    }
 
     return pythonResult;
 
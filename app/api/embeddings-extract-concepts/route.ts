@@ -1,7 +1,7 @@
 import { NextResponse } from 'next/server';
-import { spawn } from 'child_process';
-import path from 'path';
 import { AnalysisResult } from '@/app/types/pipeline';
+import { runPythonTask } from '@/app/lib/python-worker';
+import { sendStageProgress } from '@/app/lib/stage-progress';
 
 export async function POST(req: Request): Promise<Response> {
   try {
@@ -22,56 +22,44 @@ export async function POST(req: Request): Promise<Response> {
         });
       });
     });
+    // Always inline JSON: the browser cannot read the server-local files of the .npy sidecar mode
     const inputData = {
       results: responses,
       userApiKeys: userApiKeys
     };
     
-    // Run Python script
-    const pythonScript = path.join(process.cwd(), 'app', 'python', 'embeddings_extractor.py');
-
-    const pythonResult = await new Promise<Record<string, unknown>>((resolve, reject) => {
-      const pythonProcess = spawn('python', [pythonScript]);
-      let outputData = '';
-      let errorData = '';
-
-      pythonProcess.stdout.on('data', (data) => {
-        const chunk = data.toString();
-        outputData += chunk;
-      });
-
-      pythonProcess.stderr.on('data', (data) => {
-        const chunk = data.toString();
-        console.error('Python stderr:', chunk);
-        errorData += chunk;
-      });
-
-      pythonProcess.on('close', (code) => {
-        if (code !== 0) {
-          reject(new Error(`Python process exited with code ${code}: ${errorData}`));
-          return;
-        }
-
-        try {
-          const outputLines = outputData.trim().split('\n');
-          const lastLine = outputLines[outputLines.length - 1];
-          const result = JSON.parse(lastLine);
-          
-          if (result.error) {
-            reject(new Error(result.error));
-            return;
+    // Clients that accept SSE get stage progress while Python runs, then the clusters
+    if (req.headers.get('accept')?.includes('text/event-stream')) {
+      const encoder = new TextEncoder();
+      const stream = new ReadableStream({
+        async start(controller) {
+          try {
+            const clusters = await runPythonTask<Record<string, unknown>>(
+              'extract_concepts_with_embeddings',
+              inputData,
+              (progress) => sendStageProgress(controller, encoder, progress)
+            );
+            controller.enqueue(encoder.encode(`data: ${JSON.stringify({ type: 'embeddings', clusters })}\n\n`));
+            controller.enqueue(encoder.encode(`data: ${JSON.stringify({ type: 'complete' })}\n\n`));
+          } catch (error) {
+            controller.enqueue(encoder.encode(`data: ${JSON.stringify({
+              type: 'error',
+              error: error instanceof Error ? error.message : 'Unknown error',
+            })}\n\n`));
           }
-          resolve(result);
-        } catch (error) {
-          console.error('Failed to parse Python output:', outputData);
-          reject(new Error(`Failed to parse Python output: ${error}`));
-        }
+          controller.close();
+        },
+      });
+      return new NextResponse(stream, {
+        headers: {
+          'Content-Type': 'text/event-stream',
+          'Cache-Control': 'no-cache',
+          'Connection': 'keep-alive',
+        },
       });
+    }
 
-      const inputJson = JSON.stringify(inputData);
-      pythonProcess.stdin.write(inputJson);
-      pythonProcess.stdin.end();
-    });
+    const pythonResult = await runPythonTask<Record<string, unknown>>('extract_concepts_with_embeddings', inputData);
 
     return NextResponse.json(pythonResult);
 
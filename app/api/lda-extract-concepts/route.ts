@@ -1,7 +1,7 @@
 import { NextResponse } from 'next/server';
-import { spawn } from 'child_process';
-import path from 'path';
 import { AnalysisResult, LDAResult } from '@/app/types/pipeline';
+import { runPythonTask } from '@/app/lib/python-worker';
+import { sendStageProgress } from '@/app/lib/stage-progress';
 
 export async function POST(req: Request): Promise<Response> {
   const encoder = new TextEncoder();
@@ -18,50 +18,22 @@ export async function POST(req: Request): Promise<Response> {
           progress: { processed: 0, total: responses.length },
         });
 
-        const pythonScript = path.join(process.cwd(), 'app', 'python', 'lda_extractor.py');
-        const pythonProcess = spawn('python', [pythonScript]);
-
-        pythonProcess.stdin.write(JSON.stringify(responses));
-        pythonProcess.stdin.end();
-
-        let outputData = '';
-
-        pythonProcess.stdout.on('data', (data) => {
-          outputData += data.toString();
-        });
-
-        pythonProcess.stderr.on('data', (data) => {
-          const errorStr = data.toString();
-          console.error(`Python Error: ${errorStr}`);
-          if (errorStr.toLowerCase().includes('error')) {
-            sendSSE(controller, encoder, { type: 'error', error: errorStr });
-          }
-        });
-
-        pythonProcess.on('close', (code) => {
-          if (code === 0) {
-            try {
-              const ldaResults: LDAResult = JSON.parse(outputData);
-              if (ldaResults.error) {
-                sendSSE(controller, encoder, { type: 'error', error: ldaResults.error });
-              } else {
-                sendSSE(controller, encoder, {
-                  type: 'lda_concepts',
-                  topics: ldaResults.topics,
-                  distributions: ldaResults.distributions,
-                  demographicDistributions: ldaResults.demographicDistributions,
-                  progress: { processed: responses.length, total: responses.length },
-                });
-                sendSSE(controller, encoder, { type: 'complete', message: 'LDA concept extraction completed' });
-              }
-            } catch {
-              sendSSE(controller, encoder, { type: 'error', message: 'Failed to parse Python output' });
-            }
-          } else {
-            sendSSE(controller, encoder, { type: 'error', message: 'Python process exited with non-zero code' });
-          }
-          controller.close();
-        });
+        const ldaResults = await runPythonTask<LDAResult>('extract_topics', responses, (progress) =>
+          sendStageProgress(controller, encoder, progress)
+        );
+        if (ldaResults.error) {
+          sendSSE(controller, encoder, { type: 'error', error: ldaResults.error });
+        } else {
+          sendSSE(controller, encoder, {
+            type: 'lda_concepts',
+            topics: ldaResults.topics,
+            distributions: ldaResults.distributions,
+            demographicDistributions: ldaResults.demographicDistributions,
+            progress: { processed: responses.length, total: responses.length },
+          });
+          sendSSE(controller, encoder, { type: 'complete', message: 'LDA concept extraction completed' });
+        }
+        controller.close();
       } catch (error) {
         console.error('Concept extraction failed:', error);
         sendSSE(controller, encoder, {
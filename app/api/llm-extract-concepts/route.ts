@@ -1,71 +1,39 @@
 import { OpenAI } from 'openai';
 import { NextResponse } from 'next/server';
-import { AnalysisResult, ExtractedConcepts } from '@/app/types/pipeline';
-import { spawn } from 'child_process';
-import path from 'path';
+import { AnalysisResult, ClusterOutput, CompactClusterOutput, ExtractedConcepts } from '@/app/types/pipeline';
+import { expandClusterOutput } from '@/app/lib/cluster-output';
+import { runPythonTask } from '@/app/lib/python-worker';
 
 async function runConceptClustering(
   allConceptFrequencies: Map<string, number>,
   subgroupConcepts: Map<string, string[]> = new Map(),
   userApiKeys: Record<'openai' | 'anthropic' | 'huggingface' | 'deepseek', string>
 ) {
-  return new Promise((resolve, reject) => {
-    const clusteringScript = path.join(process.cwd(), 'app', 'python', 'concept_clustering.py');
-    const pythonProcess = spawn('python', [clusteringScript]);
-  
-    let outputData = '';
-    let errorData = '';
-  
-    pythonProcess.stdout.on('data', (data) => {
-      outputData += data.toString();
+  // Create subgroup frequency mapping
+  const subgroupFreqMap = new Map<string, Map<string, number>>();
+  for (const [demo, concepts] of subgroupConcepts.entries()) {
+    const freqMap = new Map<string, number>();
+    concepts.forEach(concept => {
+      freqMap.set(concept, (freqMap.get(concept) || 0) + 1);
     });
-  
-    pythonProcess.stderr.on('data', (data) => {
-      errorData += data.toString();
-    });
-  
-    pythonProcess.on('close', (code) => {
-      console.log("Python stderr:", errorData);
-      if (code !== 0) {
-        console.error('Python clustering error:', errorData);
-        return reject(new Error(`Clustering failed with code ${code}`));
-      }
-      try {
-        // Parse only the last JSON line, in case there is extra logging
-        const outputLines = outputData.trim().split('\n');
-        const lastLine = outputLines[outputLines.length - 1];
-        const clusters = JSON.parse(lastLine);
-        resolve(clusters);
-      } catch (error) {
-        reject(error);
-      }
-    });
-  
-    // Create subgroup frequency mapping
-    const subgroupFreqMap = new Map<string, Map<string, number>>();
-    for (const [demo, concepts] of subgroupConcepts.entries()) {
-      const freqMap = new Map<string, number>();
-      concepts.forEach(concept => {
-        freqMap.set(concept, (freqMap.get(concept) || 0) + 1);
-      });
-      subgroupFreqMap.set(demo, freqMap);
-    }
-  
-    const inputData = {
-      all: Array.from(allConceptFrequencies.entries()),
-      demographics: Object.fromEntries(
-        [...subgroupFreqMap.entries()].map(([demo, freqMap]) => [
-          demo,
-          Array.from(freqMap.entries())
-        ])
-      ),
-      userApiKeys: { huggingface: userApiKeys.huggingface }
-    };
-  
-    console.log("Sending clustering input data:", inputData);
-    pythonProcess.stdin.write(JSON.stringify(inputData));
-    pythonProcess.stdin.end();
-  });
+    subgroupFreqMap.set(demo, freqMap);
+  }
+
+  const inputData = {
+    all: Array.from(allConceptFrequencies.entries()),
+    demographics: Object.fromEntries(
+      [...subgroupFreqMap.entries()].map(([demo, freqMap]) => [
+        demo,
+        Array.from(freqMap.entries())
+      ])
+    ),
+    userApiKeys: { huggingface: userApiKeys.huggingface },
+    outputFormat: 'compact'
+  };
+
+  console.log("Sending clustering input data:", inputData);
+  const clusters = await runPythonTask<ClusterOutput | CompactClusterOutput>('cluster_concepts', inputData);
+  return expandClusterOutput(clusters);
 }
 
 export async function POST(req: Request): Promise<Response> {
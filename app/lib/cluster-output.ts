@@ -0,0 +1,18 @@
+import { ClusterOutput, CompactClusterOutput } from "@/app/types/pipeline";
+
+// concept_clustering.py can emit each demographic as a vector of per-cluster
+// totals instead of repeating the cluster table; rebuild the full shape here.
+export function expandClusterOutput(output: ClusterOutput | CompactClusterOutput): ClusterOutput {
+  if (!('format' in output) || output.format !== 'compact') {
+    return output as ClusterOutput;
+  }
+
+  const demographics: ClusterOutput['demographics'] = {};
+  for (const [demo, totals] of Object.entries(output.demographics)) {
+    demographics[demo] = output.all.map((cluster, index) => ({
+      ...cluster,
+      total_frequency: totals[index] ?? 0,
+    }));
+  }
+  return { all: output.all, demographics };
+}
@@ -0,0 +1,192 @@
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
+import os from 'os';
+import path from 'path';
+import readline from 'readline';
+
+export type PythonTask =
+  | 'cluster_concepts'
+  | 'extract_topics'
+  | 'extract_concepts_with_embeddings'
+  | 'calculate_agreement';
+
+// One record from app/python/progress.py
+export type PythonProgress = {
+  type: 'progress';
+  stage: string;
+  fraction: number;
+  elapsed: number;
+  eta: number | null;
+};
+
+export type PythonTaskOptions = {
+  // Kill the job's worker and reject once it has run this long (default DEFAULT_TIMEOUT_MS)
+  timeoutMs?: number;
+  // Aborting drops a queued job, or kills the worker running it
+  signal?: AbortSignal;
+};
+
+type Job = {
+  id: number;
+  task: PythonTask;
+  payload: unknown;
+  timeoutMs: number;
+  resolve: (value: unknown) => void;
+  reject: (reason: Error) => void;
+  onProgress?: (progress: PythonProgress) => void;
+};
+
+type Worker = {
+  child: ChildProcessWithoutNullStreams;
+  job: Job | null;
+  timer?: NodeJS.Timeout;
+};
+
+type WorkerResponse = {
+  id: number | null;
+  result?: unknown;
+  error?: string;
+  progress?: PythonProgress;
+};
+
+// A pool of long-lived app/python/worker.py processes, one per core by default
+// (PYTHON_WORKERS overrides). Each keeps numpy/sklearn/gensim/nltk imported
+// between requests and runs one job at a time; jobs wait in a queue for the
+// next idle worker, so a long LDA grid only occupies one of them.
+const POOL_SIZE = Math.max(1, Number(process.env.PYTHON_WORKERS) || os.cpus().length);
+const DEFAULT_TIMEOUT_MS = Number(process.env.PYTHON_TASK_TIMEOUT_MS) || 10 * 60 * 1000;
+
+const workers: Worker[] = [];
+const queue: Job[] = [];
+let nextJobId = 1;
+
+function finish(worker: Worker, outcome: { result?: unknown; error?: Error }) {
+  const job = worker.job;
+  if (!job) return;
+  clearTimeout(worker.timer);
+  worker.job = null;
+  if (outcome.error) {
+    job.reject(outcome.error);
+  } else {
+    job.resolve(outcome.result);
+  }
+  dispatch();
+}
+
+// Python cannot be interrupted mid-task, so cancelling a running job means killing its worker.
+// It leaves the pool first, so the queue never hands it another job.
+function killWorker(worker: Worker, reason: Error) {
+  const index = workers.indexOf(worker);
+  if (index !== -1) workers.splice(index, 1);
+  worker.child.kill('SIGKILL');
+  finish(worker, { error: reason });
+}
+
+function startWorker(): Worker {
+  const workerScript = path.join(process.cwd(), 'app', 'python', 'worker.py');
+  const child = spawn('python', [workerScript, '--preload'], { cwd: process.cwd() });
+  const worker: Worker = { child, job: null };
+
+  const lines = readline.createInterface({ input: child.stdout });
+  lines.on('line', (line) => {
+    let response: WorkerResponse;
+    try {
+      response = JSON.parse(line);
+    } catch {
+      console.error('Unparseable Python worker output:', line);
+      return;
+    }
+    const job = worker.job;
+    if (!job || response.id !== job.id) {
+      console.error('Python worker response without a pending job:', response);
+      return;
+    }
+    if (response.progress !== undefined) {
+      job.onProgress?.(response.progress);
+      return;
+    }
+    if (response.error !== undefined) {
+      finish(worker, { error: new Error(response.error) });
+    } else {
+      finish(worker, { result: response.result });
+    }
+  });
+
+  child.stderr.on('data', (data) => {
+    console.error('Python worker stderr:', data.toString());
+  });
+
+  // Writing to a worker that has just died fails with EPIPE; 'exit' reports the failure
+  child.stdin.on('error', (err) => {
+    console.error('Python worker stdin error:', err);
+  });
+
+  child.on('error', (err) => {
+    console.error('Failed to start Python worker:', err);
+    removeWorker(worker, new Error(`Failed to start Python worker: ${err.message}`));
+  });
+
+  child.on('exit', (code, signal) => {
+    console.error(`Python worker exited with ${signal ?? `code ${code}`}`);
+    removeWorker(worker, new Error(`Python worker exited with ${signal ?? `code ${code}`}`));
+  });
+
+  workers.push(worker);
+  return worker;
+}
+
+function removeWorker(worker: Worker, reason: Error) {
+  const index = workers.indexOf(worker);
+  if (index !== -1) workers.splice(index, 1);
+  finish(worker, { error: reason });
+}
+
+function dispatch() {
+  while (queue.length > 0) {
+    const worker = workers.find((w) => w.job === null) ?? (workers.length < POOL_SIZE ? startWorker() : null);
+    if (!worker) return;
+    const job = queue.shift()!;
+    worker.job = job;
+    worker.timer = setTimeout(
+      () => killWorker(worker, new Error(`Python task ${job.task} timed out after ${job.timeoutMs} ms`)),
+      job.timeoutMs
+    );
+    worker.child.stdin.write(JSON.stringify({ id: job.id, task: job.task, payload: job.payload }) + '\n');
+  }
+}
+
+export function runPythonTask<T>(
+  task: PythonTask,
+  payload: unknown,
+  onProgress?: (progress: PythonProgress) => void,
+  options: PythonTaskOptions = {}
+): Promise<T> {
+  const { timeoutMs = DEFAULT_TIMEOUT_MS, signal } = options;
+  return new Promise<T>((resolve, reject) => {
+    if (signal?.aborted) {
+      reject(new Error(`Python task ${task} was cancelled`));
+      return;
+    }
+    const job: Job = {
+      id: nextJobId++,
+      task,
+      payload,
+      timeoutMs,
+      resolve: resolve as (value: unknown) => void,
+      reject,
+      onProgress,
+    };
+    signal?.addEventListener('abort', () => {
+      const cancelled = new Error(`Python task ${task} was cancelled`);
+      const queued = queue.indexOf(job);
+      if (queued !== -1) {
+        queue.splice(queued, 1);
+        reject(cancelled);
+        return;
+      }
+      const running = workers.find((w) => w.job === job);
+      if (running) killWorker(running, cancelled);
+    }, { once: true });
+    queue.push(job);
+    dispatch();
+  });
+}
@@ -0,0 +1,19 @@
+import type { PythonProgress } from '@/app/lib/python-worker';
+
+export type StageProgressEvent = Omit<PythonProgress, 'type'> & { type: 'stage_progress' };
+
+// Forward a Python progress record to the client as an SSE event
+export function sendStageProgress(
+  controller: ReadableStreamDefaultController,
+  encoder: TextEncoder,
+  progress: PythonProgress
+) {
+  const event: StageProgressEvent = { ...progress, type: 'stage_progress' };
+  controller.enqueue(encoder.encode(`data: ${JSON.stringify(event)}\n\n`));
+}
+
+export function describeStageProgress(event: StageProgressEvent): string {
+  const percent = Math.round(event.fraction * 100);
+  const eta = event.eta === null ? '' : `, about ${Math.ceil(event.eta)}s left`;
+  return `${event.stage.replace(/_/g, ' ')}: ${percent}%${eta}`;
+}
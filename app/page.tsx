@@ -19,6 +19,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { AgreementScoreVisualizations } from "@/components/ui/AgreementScoreVisualizations";
 import { DropdownMenu, DropdownMenuContent, DropdownMenuItem, DropdownMenuTrigger, } from "@/components/ui/dropdown-menu";
 import { downloadCSV, createMergedAnalysisCSV } from "@/app/lib/csv-utils";
+import { describeStageProgress } from "@/app/lib/stage-progress";
 import { PipelineParams, PaginationState, ExtractionProgress, SavedAnalysis, DEFAULT_PIPELINE_PARAMS } from "@/app/lib/constants";
 
 const ITEMS_PER_PAGE = 5;
@@ -621,6 +622,17 @@ export default function Home() {
                       },
                     }));
                     break;
+                  case 'stage_progress':
+                    setExtractionProgress(prev => ({
+                      ...prev,
+                      lda: {
+                        processed: Math.round(data.fraction * 100),
+                        total: 100,
+                        message: describeStageProgress(data),
+                        type: 'lda',
+                      },
+                    }));
+                    break;
                   case 'lda_concepts':
                     setLdaResults({
                       topics: data.topics,
@@ -686,7 +698,7 @@ export default function Home() {
       
       const response = await fetch(`${getApiBase()}/embeddings-extract-concepts`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
         body: JSON.stringify({ results, userApiKeys })
       });
 
@@ -694,13 +706,52 @@ export default function Home() {
         throw new Error('Embeddings extraction failed');
       }
 
-      const data = await response.json();
-      if (data.error) {
-        throw new Error(data.error);
+      const reader = response.body?.getReader();
+      if (!reader) {
+        throw new Error('Embeddings extraction returned no body');
+      }
+      const decoder = new TextDecoder();
+      let buffered = '';
+      try {
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          // Events can be split across chunks, so only parse complete lines
+          buffered += decoder.decode(value, { stream: true });
+          const lines = buffered.split('\n');
+          buffered = lines.pop() ?? '';
+          for (const line of lines) {
+            if (!line.startsWith('data: ')) continue;
+            const data = JSON.parse(line.slice(5));
+            switch (data.type) {
+              case 'stage_progress':
+                setExtractionProgress(prev => ({
+                  ...prev,
+                  embeddings: {
+                    processed: Math.round(data.fraction * 100),
+                    total: 100,
+                    message: describeStageProgress(data),
+                    type: 'embeddings',
+                  },
+                }));
+                break;
+              case 'embeddings':
+                if (data.clusters.error) {
+                  throw new Error(data.clusters.error);
+                }
+                setEmbeddingsResults(data.clusters);
+                break;
+              case 'error':
+                throw new Error(data.error);
+            }
+          }
+        }
+      } finally {
+        reader.releaseLock();
       }
 
-      setEmbeddingsResults(data);
       setIsExtracting(prev => ({ ...prev, embeddings: false }));
+      setExtractionProgress(prev => ({ ...prev, embeddings: undefined }));
 
     } catch (error) {
       console.error('Embeddings extraction failed:', error);
@@ -727,8 +778,8 @@ export default function Home() {
   const ExtractionProgressDisplay = () => {
     return (
       <>
-        {(isExtracting.llm || isExtracting.lda ||
-          extractionProgress.llm || extractionProgress.lda) && (
+        {(isExtracting.llm || isExtracting.lda || isExtracting.embeddings ||
+          extractionProgress.llm || extractionProgress.lda || extractionProgress.embeddings) && (
             <div className="space-y-4 mb-4">
               {/* LLM Progress */}
               {(isExtracting.llm || extractionProgress.llm) && (
@@ -758,6 +809,38 @@ export default function Home() {
                 </div>
               )}
 
+              {/* LDA and embeddings stage progress, reported by the Python stages */}
+              {(['lda', 'embeddings'] as const).map((kind) => {
+                const stageProgress = extractionProgress[kind];
+                if (!isExtracting[kind] && !stageProgress) return null;
+                return (
+                  <div key={kind} className="space-y-2 p-4 bg-muted rounded-lg border">
+                    <div className="space-y-1">
+                      <div className="flex justify-between text-sm">
+                        <span className="text-muted-foreground">
+                          {stageProgress?.message ||
+                            (kind === 'lda' ? 'Initializing LDA topic extraction...' : 'Initializing embeddings extraction...')}
+                        </span>
+                        {stageProgress && (
+                          <span className="font-medium">
+                            {Math.round((stageProgress.processed / stageProgress.total) * 100)}%
+                          </span>
+                        )}
+                      </div>
+                      <div className="w-full bg-secondary rounded-full h-2">
+                        <div
+                          className="bg-primary rounded-full h-2 transition-all duration-300"
+                          style={{
+                            width: stageProgress
+                              ? `${(stageProgress.processed / stageProgress.total) * 100}%`
+                              : '0%'
+                          }}
+                        />
+                      </div>
+                    </div>
+                  </div>
+                );
+              })}
             </div>
           )}
       </>
@@ -0,0 +1,96 @@
+"""Peak RSS of a million-row run from an EmbeddingStore against the same run on one in-memory array.
+
+Usage: python bench_embedding_store.py [n_rows] [k_values...]   (default 1000000, k = 6 8 10)
+
+Each step runs in its own process, so ru_maxrss is that step's peak.
+"append" writes synthetic 384-dimensional float32 embeddings into a new
+store, 20000 rows per append. "array" reads the rows into one array, as
+embeddings_extractor did, then fits the 2D projection, a chunked
+MiniBatchKMeans per k and a sampled silhouette. "store" runs the same
+steps through the store's memory map. Store chunks are released once read,
+so its peak is about one chunk plus the silhouette distance block, however
+many rows there are.
+"""
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import subprocess
+import numpy as np
+
+DIM = 384
+STEPS = ("append", "array", "store")
+
+
+def build(path, n, chunk=20000):
+    from embedding_store import EmbeddingStore
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((8, DIM), dtype=np.float32)
+    store = EmbeddingStore.create(path, "synthetic", DIM)
+    for start in range(0, n, chunk):
+        rows = min(chunk, n - start)
+        store.append(centers[rng.integers(0, 8, rows)] + 0.3 * rng.standard_normal((rows, DIM), dtype=np.float32))
+
+
+def analyse(embeddings, k_values):
+    from sklearn.metrics import silhouette_score
+    from projection import fit_projection
+    from clustering_sweep import fit_kmeans_chunked, stratified_sample, SILHOUETTE_SAMPLE_SIZE
+
+    fit_projection(embeddings, solver="covariance").transform(embeddings)
+    scores = {}
+    for k in k_values:
+        labels, _ = fit_kmeans_chunked(embeddings, k)
+        sample = stratified_sample(labels, SILHOUETTE_SAMPLE_SIZE)
+        scores[k] = float(silhouette_score(np.asarray(embeddings[sample]), labels[sample]))
+    return scores
+
+
+def run(step, path, n, k_values):
+    from embedding_store import EmbeddingStore, HEADER_BYTES
+
+    start = time.perf_counter()
+    scores = None
+    if step == "append":
+        build(path, n)
+    elif step == "array":
+        embeddings = np.fromfile(path, dtype=np.float32, offset=HEADER_BYTES).reshape(-1, DIM)
+        scores = analyse(embeddings, k_values)
+    else:
+        scores = analyse(EmbeddingStore(path), k_values)
+    return {
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "scores": scores,
+    }
+
+
+def main():
+    if len(sys.argv) >= 4 and sys.argv[1] == "--child":
+        print(json.dumps(run(sys.argv[2], sys.argv[3], int(sys.argv[4]), [int(k) for k in sys.argv[5:]])))
+        return
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    k_values = [int(k) for k in sys.argv[2:]] or [6, 8, 10]
+    print(f"{n} rows x {DIM} float32 ({n * DIM * 4 / 2 ** 20:.0f} MB), k = {k_values}")
+    print(f"{'step':>8}  {'peak RSS MB':>12}  {'seconds':>8}  silhouette by k")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "embeddings.store")
+        for step in STEPS:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--child", step, path, str(n), *map(str, k_values)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"{step:>8}  failed (exit {proc.returncode})")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            scores = "" if r["scores"] is None else ", ".join(f"{k}: {s:.3f}" for k, s in r["scores"].items())
+            print(f"{step:>8}  {r['peak_rss_mb']:>12.0f}  {r['seconds']:>8.1f}  {scores}")
+
+
+if __name__ == "__main__":
+    main()
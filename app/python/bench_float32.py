@@ -0,0 +1,76 @@
+"""Peak RSS and runtime of the embedding pipeline in float64, float32 and float16 storage.
+
+Usage: python bench_float32.py [sizes...]   (default 10000 100000 500000)
+
+Every (size, mode) pair runs in its own process, so ru_maxrss is that run's
+peak. The process builds synthetic 384-dimensional MiniLM-sized embeddings
+around 8 centres and then runs the embeddings_extractor stages: 2D PCA,
+KMeans (k=8, one init, 20 iterations) and a 10k-row cosine silhouette.
+"float16" keeps the stored matrix in float16 and upcasts it to float32 for
+the arithmetic, the same way a float16 embedding cache is read back.
+"""
+import sys
+import json
+import time
+import resource
+import subprocess
+
+DIM = 384
+N_CENTERS = 8
+SILHOUETTE_SAMPLE = 10000
+MODES = {"float64": ("float64", "float64"), "float32": ("float32", "float32"), "float16": ("float16", "float32")}
+
+
+def synthetic_embeddings(n, dtype, chunk=50000):
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((N_CENTERS, DIM), dtype=np.float32)
+    out = np.empty((n, DIM), dtype=dtype)
+    # Generate in chunks so the float32 runs never hold a float64 copy
+    for start in range(0, n, chunk):
+        rows = min(chunk, n - start)
+        block = centers[rng.integers(0, N_CENTERS, rows)] + 0.3 * rng.standard_normal((rows, DIM), dtype=np.float32)
+        out[start:start + rows] = block
+    return out
+
+
+def run(n, mode):
+    import numpy as np
+    from sklearn.cluster import KMeans
+    from sklearn.decomposition import PCA
+    from sklearn.metrics import silhouette_score
+
+    storage, compute = MODES[mode]
+    stored = synthetic_embeddings(n, storage)
+    start = time.perf_counter()
+    embeddings = stored.astype(compute, copy=False)
+    PCA(n_components=2).fit_transform(embeddings)
+    labels = KMeans(n_clusters=N_CENTERS, n_init=1, max_iter=20, random_state=42).fit_predict(embeddings)
+    silhouette_score(embeddings, labels, sample_size=min(n, SILHOUETTE_SAMPLE), random_state=0)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"n": n, "mode": mode, "seconds": elapsed, "peak_rss_mb": peak_mb, "stored_mb": stored.nbytes / 2 ** 20}
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        print(json.dumps(run(int(sys.argv[2]), sys.argv[3])))
+        return
+
+    sizes = [int(s) for s in sys.argv[1:]] or [10000, 100000, 500000]
+    print(f"{'n':>8}  {'mode':>8}  {'matrix MB':>10}  {'peak RSS MB':>12}  {'seconds':>8}")
+    for n in sizes:
+        for mode in MODES:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--child", str(n), mode], capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                print(f"{n:>8}  {mode:>8}  failed (exit {proc.returncode}, likely out of memory)")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{n:>8}  {mode:>8}  {r['stored_mb']:>10.0f}  {r['peak_rss_mb']:>12.0f}  {r['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compare the old embeddings_extractor k sweep with sweep_kmeans and sweep_bisecting.
+
+Usage: python bench_kmeans_sweep.py [n_rows] [sample_size] [max_workers]
+
+The old sweep fits KMeans(n_init=10) for k = 4..14, scores each fit with a
+full silhouette_score and then refits the winning k. sweep_kmeans fits the
+same k values (in parallel when there are several cores), scores them all
+on one cached distance block for a stratified sample, and keeps the winning
+fit. sweep_bisecting takes every k from one bisecting k-means pass and
+scores it the same way. Its labels are nested splits, so they are compared
+with the old sweep's by adjusted Rand index rather than equality.
+"""
+import os
+import sys
+import time
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score, adjusted_rand_score
+from clustering_sweep import sweep_kmeans, sweep_bisecting
+
+K_VALUES = range(4, 15)
+
+
+def old_sweep(embeddings):
+    n_clusters, best_score = 4, -1
+    for k in K_VALUES:
+        labels = KMeans(n_clusters=k, random_state=42, n_init=10).fit_predict(embeddings)
+        score = silhouette_score(embeddings, labels)
+        if score > best_score:
+            best_score, n_clusters = score, k
+    return n_clusters, KMeans(n_clusters=n_clusters, random_state=42, n_init=10).fit_predict(embeddings)
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sample_size = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 1
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(9, 384)).astype(np.float32)
+    embeddings = centers[rng.integers(0, len(centers), size=n_rows)] + rng.normal(size=(n_rows, 384)).astype(np.float32)
+
+    start = time.perf_counter()
+    old_k, old_labels = old_sweep(embeddings)
+    old_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, new_k, new_labels = sweep_kmeans(embeddings, K_VALUES, sample_size=sample_size, max_workers=max_workers)
+    new_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, bisect_k, bisect_labels = sweep_bisecting(embeddings, K_VALUES, sample_size=sample_size)
+    bisect_time = time.perf_counter() - start
+
+    same = old_k == new_k and np.array_equal(old_labels, new_labels)
+    print(f"{n_rows} rows, silhouette sample {sample_size}, {max_workers} workers")
+    print(f"  old sweep:    {old_time:7.2f}s  k={old_k}")
+    print(f"  sweep_kmeans: {new_time:7.2f}s  k={new_k}  speedup {old_time / new_time:4.1f}x  same labels: {same}")
+    print(f"  bisecting:    {bisect_time:7.2f}s  k={bisect_k}  speedup {old_time / bisect_time:4.1f}x  "
+          f"ARI vs old: {adjusted_rand_score(old_labels, bisect_labels):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark merge_small_clusters against the original pairwise merge loop.
+
+Usage: python bench_merge_clusters.py [n_clusters] [dim]
+"""
+import sys
+import time
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from concept_clustering import merge_small_clusters
+
+
+def legacy_merge(clusters_dict, embeddings, weights, min_freq_threshold):
+    """The per-pair loop process_clustering used before merge_small_clusters."""
+    clusters_dict = {label: list(indices) for label, indices in clusters_dict.items()}
+    centroid_of = lambda indices: np.average(embeddings[indices], axis=0, weights=weights[indices])
+    cluster_centroids = {label: centroid_of(indices) for label, indices in clusters_dict.items()}
+    small_labels = [label for label, indices in clusters_dict.items() if weights[indices].sum() < min_freq_threshold]
+    for small_label in small_labels:
+        if len(clusters_dict) == 1:
+            break
+        small_centroid = cluster_centroids[small_label].reshape(1, -1)
+        best_label = None
+        best_sim = -1
+        for label, centroid in cluster_centroids.items():
+            if label == small_label:
+                continue
+            sim = cosine_similarity(small_centroid, centroid.reshape(1, -1))[0][0]
+            if sim > best_sim:
+                best_sim = sim
+                best_label = label
+        if best_label is not None:
+            clusters_dict[best_label].extend(clusters_dict[small_label])
+            del clusters_dict[small_label]
+            cluster_centroids[best_label] = centroid_of(clusters_dict[best_label])
+            del cluster_centroids[small_label]
+    return clusters_dict
+
+
+def make_micro_clusters(n_clusters, dim, seed=0):
+    """Simulated DBSCAN output: many tiny clusters plus a noise label -1."""
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(1, 6, size=n_clusters)
+    labels = np.repeat(np.arange(n_clusters), sizes)
+    noise = rng.integers(0, len(labels), size=len(labels) // 10)
+    labels[noise] = -1
+    centers = rng.normal(size=(n_clusters, dim))
+    embeddings = centers[np.maximum(labels, 0)] + 0.3 * rng.normal(size=(len(labels), dim))
+    weights = rng.integers(1, 4, size=len(labels))
+    clusters_dict = {}
+    for idx, label in enumerate(labels):
+        clusters_dict.setdefault(label, []).append(idx)
+    return clusters_dict, embeddings, weights
+
+
+def main():
+    n_clusters = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+    clusters_dict, embeddings, weights = make_micro_clusters(n_clusters, dim)
+    print(f"{len(clusters_dict)} clusters, {len(embeddings)} rows, dim {dim}")
+
+    start = time.perf_counter()
+    expected = legacy_merge(clusters_dict, embeddings, weights, min_freq_threshold=8)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    merged = merge_small_clusters(clusters_dict, embeddings, weights, min_freq_threshold=8)
+    new_time = time.perf_counter() - start
+
+    same = list(expected.keys()) == list(merged.keys()) and all(
+        sorted(expected[label]) == sorted(merged[label]) for label in expected
+    )
+    print(f"legacy loop:          {legacy_time:8.3f}s -> {len(expected)} clusters")
+    print(f"merge_small_clusters: {new_time:8.3f}s -> {len(merged)} clusters")
+    print(f"speedup: {legacy_time / new_time:.1f}x, identical merges: {same}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
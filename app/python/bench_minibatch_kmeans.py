@@ -0,0 +1,55 @@
+"""Compare full KMeans with the MiniBatchKMeans path used for large concept sets.
+
+Usage: python bench_minibatch_kmeans.py [n_rows ...]
+
+Inertia is the weighted sum of squared distances to the assigned centre,
+measured on the full data for both models.
+"""
+import sys
+import time
+import numpy as np
+from concept_clustering import kmeans_labels, KMEANS_OPTIONS
+from sklearn.cluster import KMeans
+
+N_CLUSTERS = 16
+
+
+def make_embeddings(n_rows, dim=384, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(40, dim))
+    embeddings = centers[rng.integers(0, len(centers), size=n_rows)] + 0.5 * rng.normal(size=(n_rows, dim))
+    return embeddings, rng.integers(1, 20, size=n_rows)
+
+
+def weighted_inertia(embeddings, weights, labels):
+    inertia = 0.0
+    for label in np.unique(labels):
+        members = labels == label
+        center = np.average(embeddings[members], axis=0, weights=weights[members])
+        inertia += float((weights[members] * ((embeddings[members] - center) ** 2).sum(axis=1)).sum())
+    return inertia
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [20000, 100000]
+    print(f"MiniBatchKMeans options: {KMEANS_OPTIONS}")
+    print(f"{'rows':>8} {'full s':>8} {'mini s':>8} {'speedup':>8} {'inertia diff':>13}")
+    for n_rows in sizes:
+        embeddings, weights = make_embeddings(n_rows)
+
+        start = time.perf_counter()
+        full = KMeans(n_clusters=N_CLUSTERS, random_state=0).fit_predict(embeddings, sample_weight=weights)
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        mini = kmeans_labels(embeddings, weights, N_CLUSTERS, minibatch_threshold=0)
+        mini_time = time.perf_counter() - start
+
+        full_inertia = weighted_inertia(embeddings, weights, full)
+        mini_inertia = weighted_inertia(embeddings, weights, mini)
+        diff = (mini_inertia - full_inertia) / full_inertia
+        print(f"{n_rows:>8} {full_time:>8.2f} {mini_time:>8.2f} {full_time / mini_time:>7.1f}x {diff:>+12.2%}")
+
+
+if __name__ == "__main__":
+    main()
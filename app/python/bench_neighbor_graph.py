@@ -0,0 +1,64 @@
+"""Compare DBSCAN on a precomputed cosine radius graph with DBSCAN(metric='cosine').
+
+Usage: python bench_neighbor_graph.py [n_rows ...]
+
+Peak memory is measured with tracemalloc, which tracks NumPy and SciPy
+allocations. The brute-force cosine path is skipped above
+LEGACY_MAX_ROWS rows.
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+from sklearn.cluster import DBSCAN
+from neighbor_graph import cosine_radius_graph
+
+LEGACY_MAX_ROWS = 20000
+EPS = 0.25
+MIN_SAMPLES = 2
+
+
+def make_embeddings(n_rows, dim=384, seed=0):
+    """Concept-like embeddings: tight groups of about 20 around random directions."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n_rows // 20), dim))
+    assignment = rng.integers(0, len(centers), size=n_rows)
+    return centers[assignment] + 0.2 * rng.normal(size=(n_rows, dim))
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+def legacy(embeddings):
+    return DBSCAN(eps=EPS, min_samples=MIN_SAMPLES, metric='cosine').fit_predict(embeddings)
+
+
+def graph_path(embeddings):
+    graph = cosine_radius_graph(embeddings, EPS)
+    return DBSCAN(eps=EPS, min_samples=MIN_SAMPLES, metric='precomputed').fit_predict(graph)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2000, 10000, 50000]
+    print(f"{'rows':>8} {'path':>10} {'seconds':>9} {'peak MB':>9} {'clusters':>9} {'agree':>6}")
+    for n_rows in sizes:
+        embeddings = make_embeddings(n_rows)
+        labels, elapsed, peak = measure(lambda: graph_path(embeddings))
+        n_clusters = len(set(labels) - {-1})
+        print(f"{n_rows:>8} {'graph':>10} {elapsed:>9.2f} {peak:>9.1f} {n_clusters:>9}")
+        if n_rows > LEGACY_MAX_ROWS:
+            continue
+        legacy_labels, elapsed, peak = measure(lambda: legacy(embeddings))
+        agree = np.array_equal(labels, legacy_labels)
+        print(f"{n_rows:>8} {'cosine':>10} {elapsed:>9.2f} {peak:>9.1f} {len(set(legacy_labels) - {-1}):>9} {str(agree):>6}")
+
+
+if __name__ == "__main__":
+    main()
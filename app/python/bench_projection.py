@@ -0,0 +1,78 @@
+"""Runtime and peak RSS of each fit_projection solver against sklearn's PCA.
+
+Usage: python bench_projection.py [sizes...]   (default 10000 100000 500000)
+
+Synthetic 384-dimensional float32 embeddings are written once per size to a
+temporary .npy file. Every (size, solver) pair then runs in its own process,
+so ru_maxrss is that run's peak. "pca" is the old PCA(n_components=2) on the
+loaded matrix. "covariance" and "incremental" stream the memory-mapped file
+in chunks instead of loading it. Their RSS still counts the file pages they
+touched, which the kernel can reclaim. The deviation column is the largest
+difference from the "pca" coordinates, relative to the coordinate range.
+"""
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import subprocess
+import numpy as np
+
+DIM = 384
+SOLVERS = ("pca", "covariance", "randomized", "incremental")
+
+
+def write_embeddings(path, n, chunk=50000):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((8, DIM), dtype=np.float32)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, DIM))
+    for start in range(0, n, chunk):
+        rows = min(chunk, n - start)
+        out[start:start + rows] = centers[rng.integers(0, 8, rows)] + 0.3 * rng.standard_normal((rows, DIM), dtype=np.float32)
+    out.flush()
+
+
+def run(path, solver):
+    from sklearn.decomposition import PCA
+    from projection import fit_projection
+
+    start = time.perf_counter()
+    if solver == "pca":
+        coordinates = PCA(n_components=2).fit_transform(np.load(path))
+    elif solver in ("covariance", "incremental"):
+        mapped = np.load(path, mmap_mode="r")
+        coordinates = fit_projection(mapped, solver=solver).transform(mapped)
+    else:
+        embeddings = np.load(path)
+        coordinates = fit_projection(embeddings, solver=solver).transform(embeddings)
+    elapsed = time.perf_counter() - start
+    np.save(f"{path}.{solver}.npy", coordinates)
+    return {"seconds": elapsed, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        print(json.dumps(run(sys.argv[2], sys.argv[3])))
+        return
+
+    sizes = [int(s) for s in sys.argv[1:]] or [10000, 100000, 500000]
+    print(f"{'n':>8}  {'solver':>12}  {'peak RSS MB':>12}  {'seconds':>8}  {'deviation':>9}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n in sizes:
+            path = os.path.join(tmpdir, f"embeddings-{n}.npy")
+            write_embeddings(path, n)
+            for solver in SOLVERS:
+                proc = subprocess.run([sys.executable, __file__, "--child", path, solver], capture_output=True, text=True)
+                if proc.returncode != 0:
+                    print(f"{n:>8}  {solver:>12}  failed (exit {proc.returncode})")
+                    continue
+                r = json.loads(proc.stdout.strip().splitlines()[-1])
+                reference = np.load(f"{path}.pca.npy")
+                deviation = np.abs(np.load(f"{path}.{solver}.npy") - reference).max() / np.ptp(reference)
+                print(f"{n:>8}  {solver:>12}  {r['peak_rss_mb']:>12.0f}  {r['seconds']:>8.2f}  {deviation:>9.1e}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
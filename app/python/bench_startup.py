@@ -0,0 +1,89 @@
+"""Record `python -X importtime` for each analysis script and check a start-up budget.
+
+Usage: python bench_startup.py [runs] [--top N]
+
+Each module is imported in a fresh interpreter ``runs`` times. The report
+shows the median cumulative import time and the heaviest imports from the
+median run. The process exits non-zero if any module is over its entry in
+STARTUP_BUDGET_MS. That makes a heavy dependency moved back to module level
+show up as a failure instead of a slow first request.
+"""
+import os
+import re
+import sys
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(HERE, "..", ".."))
+
+# Median cumulative import time allowed per module, in milliseconds. These are
+# roughly 2x the measured numbers once sklearn, scipy, gensim, nltk and requests
+# became lazy. Before that, concept_clustering alone took about 1400 ms.
+STARTUP_BUDGET_MS = {
+    "concept_clustering": 250,
+    "embeddings_extractor": 250,
+    "lda_extractor": 250,
+    "worker": 250,
+}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+
+def import_profile(module):
+    """Import ``module`` in a new interpreter and return [(name, self_us, cumulative_us, depth)]."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([HERE, REPO_ROOT, os.environ.get("PYTHONPATH", "")])}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def total_ms(rows):
+    """Cumulative time of the top-level imports, which covers everything imported under them."""
+    return sum(cumulative for _, _, cumulative, depth in rows if depth == 0) / 1000
+
+
+def main():
+    args = sys.argv[1:]
+    top = 8
+    if "--top" in args:
+        index = args.index("--top")
+        top = int(args[index + 1])
+        del args[index:index + 2]
+    runs = int(args[0]) if args else 5
+
+    over_budget = []
+    for module, budget in STARTUP_BUDGET_MS.items():
+        try:
+            profiles = [import_profile(module) for _ in range(runs)]
+        except RuntimeError as e:
+            print(f"{module}: {e}\n")
+            over_budget.append(module)
+            continue
+        profiles.sort(key=total_ms)
+        median = profiles[len(profiles) // 2]
+        median_ms = total_ms(median)
+        status = "ok" if median_ms <= budget else "OVER BUDGET"
+        print(f"{module}: {median_ms:.1f} ms median of {runs} (budget {budget} ms) {status}")
+        for name, _, cumulative, depth in sorted(median, key=lambda r: r[2], reverse=True)[:top]:
+            print(f"    {cumulative / 1000:8.1f} ms  {'  ' * depth}{name}")
+        print()
+        if median_ms > budget:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Start-up budget exceeded for: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Time the DBSCAN parameter sweep with an increasing number of worker processes.
+
+Usage: python bench_sweep.py [n_rows] [max_workers]
+"""
+import os
+import sys
+import time
+import numpy as np
+from clustering_sweep import sweep_dbscan
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(max(1, n_rows // 50), 384))
+    embeddings = centers[rng.integers(0, len(centers), size=n_rows)] + 0.25 * rng.normal(size=(n_rows, 384))
+    weights = rng.integers(1, 10, size=n_rows)
+    grid = {"eps": [0.15, 0.2, 0.25, 0.3], "min_samples": [2, 3, 5, 8], "min_freq_threshold": [3]}
+
+    print(f"{n_rows} rows, {4 * 4} settings")
+    baseline = None
+    workers = 1
+    while workers <= max_workers:
+        start = time.perf_counter()
+        _, best = sweep_dbscan(embeddings, weights, grid, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>3} workers: {elapsed:7.2f}s  speedup {baseline / elapsed:4.1f}x  "
+              f"best eps={best['eps']} min_samples={best['min_samples']}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Compare spawn-per-request latency with jobs sent to a warm worker.py process.
+
+Usage: python bench_worker.py [n_jobs] [task] [payload_json]
+
+Cold runs start a fresh worker for each job, paying interpreter start-up
+and imports just as the old spawn-per-request routes did. Warm runs send
+every job to one worker started with --preload, as app/lib/python-worker.ts
+starts them. The default payload clusters DEFAULT_CONCEPTS for real, so
+sklearn, scipy and nltk are all loaded. Its embeddings are synthetic and
+written to a temporary embedding cache first, so no backend is called.
+"""
+import os
+import sys
+import json
+import time
+import itertools
+import tempfile
+import subprocess
+import numpy as np
+
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+TOPICS = ("work", "family", "health", "money", "school", "housing")
+ASPECTS = ("stress", "pressure", "support", "cost", "time", "worry", "change", "future")
+DEFAULT_CONCEPTS = [[f"{topic} {aspect}", 1 + i % 5]
+                    for i, (topic, aspect) in enumerate(itertools.product(TOPICS, ASPECTS))]
+DEFAULT_PAYLOAD = {
+    "all": DEFAULT_CONCEPTS,
+    "demographics": {"group1": DEFAULT_CONCEPTS[::2], "group2": DEFAULT_CONCEPTS[1::2]},
+    "userApiKeys": {"huggingface": "bench"},
+}
+
+
+def fill_cache(path, dim=384):
+    """Store synthetic embeddings for the default concepts, clustered by topic, under the backend's cache key."""
+    from concept_clustering import ConceptVocabulary
+    from embedding_backends import get_backend
+    from embedding_cache import EmbeddingCache
+
+    vocabulary = ConceptVocabulary()
+    vocabulary.normalize([concept for concept, _ in DEFAULT_CONCEPTS])
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((len(TOPICS), dim))
+    topic_of = [next((i for i, topic in enumerate(TOPICS) if topic in concept), 0) for concept in vocabulary.concepts]
+    vectors = centers[topic_of] + 0.2 * rng.standard_normal((len(topic_of), dim))
+    cache = EmbeddingCache(path)
+    cache.put_many(get_backend(hf_api_key="bench").cache_key, vocabulary.concepts, vectors.astype(np.float32))
+    cache.close()
+
+
+def send(proc, job):
+    """Send one job and return its response line, skipping the progress records written before it."""
+    proc.stdin.write(json.dumps(job) + "\n")
+    proc.stdin.flush()
+    while True:
+        response = json.loads(proc.stdout.readline())
+        if "progress" not in response:
+            return response
+
+
+def start_worker(preload=False):
+    return subprocess.Popen(
+        [sys.executable, WORKER] + (["--preload"] if preload else []), stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+
+
+def main():
+    n_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    task = sys.argv[2] if len(sys.argv) > 2 else "cluster_concepts"
+    payload = json.loads(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if payload is None:
+            payload = DEFAULT_PAYLOAD
+            # The workers inherit these, so they find every embedding in the cache
+            os.environ["EMBEDDING_BACKEND"] = "huggingface"
+            os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmpdir, "embeddings.sqlite3")
+            fill_cache(os.environ["EMBEDDING_CACHE_PATH"])
+
+        cold = []
+        for i in range(n_jobs):
+            start = time.perf_counter()
+            proc = start_worker()
+            response = send(proc, {"id": i, "task": task, "payload": payload})
+            proc.stdin.close()
+            proc.wait()
+            cold.append(time.perf_counter() - start)
+
+        warm = []
+        proc = start_worker(preload=True)
+        send(proc, {"id": -1, "task": task, "payload": payload})  # first job loads the NLTK corpora
+        for i in range(n_jobs):
+            start = time.perf_counter()
+            response = send(proc, {"id": i, "task": task, "payload": payload})
+            warm.append(time.perf_counter() - start)
+        proc.stdin.close()
+        proc.wait()
+
+    if "error" in response:
+        print(f"Note: task returned an error: {response['error']}")
+    print(f"task {task}, {n_jobs} jobs")
+    print(f"cold (spawn per job): median {sorted(cold)[len(cold) // 2] * 1000:8.1f} ms")
+    print(f"warm (worker.py):     median {sorted(warm)[len(warm) // 2] * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import numpy as np
+from neighbor_graph import normalize_rows
+from versioned_npz import save_versioned_npz, load_versioned_npz
+
+MODEL_VERSION = 1
+
+
+class ClusterModel:
+    """Fitted concept clusters that can be saved and extended with new concepts.
+
+    ``clusters`` uses the ``cluster_concepts`` output shape (id, concepts,
+    frequency, total_frequency, label). ``centroids`` holds the
+    frequency-weighted mean embedding of each cluster, row-aligned with
+    ``clusters`` and stored as float32. ``embedding_key`` records which
+    embedding backend produced the centroids, so concepts embedded by another
+    model are never compared against them.
+    """
+
+    def __init__(self, clusters, centroids, params, embedding_key):
+        self.clusters = clusters
+        centroids = np.asarray(centroids, dtype=np.float32)
+        self.centroids = centroids.reshape(len(clusters), -1) if clusters else np.empty((0, 0), dtype=np.float32)
+        self.params = params
+        self.embedding_key = embedding_key
+
+    @property
+    def concept_to_cluster(self):
+        return {concept: cluster['id'] for cluster in self.clusters for concept in cluster['concepts']}
+
+    def save(self, path):
+        """Write the model to an .npz file, replacing any previous version atomically."""
+        meta = {"clusters": self.clusters, "params": self.params, "embedding_key": self.embedding_key}
+        save_versioned_npz(path, MODEL_VERSION, meta, centroids=self.centroids)
+
+    @classmethod
+    def load(cls, path):
+        meta, arrays = load_versioned_npz(path, MODEL_VERSION, "cluster model")
+        return cls(meta["clusters"], arrays["centroids"], meta["params"], meta["embedding_key"])
+
+    def nearest(self, embeddings):
+        """Return (row, cosine similarity) of the closest centroid for each embedding."""
+        if not self.clusters:
+            return np.full(len(embeddings), -1), np.full(len(embeddings), -np.inf)
+        similarities = normalize_rows(embeddings) @ normalize_rows(self.centroids).T
+        rows = similarities.argmax(axis=1)
+        return rows, similarities[np.arange(len(rows)), rows]
+
+    def add(self, row, concept, weight, embedding):
+        """Add ``weight`` occurrences of ``concept`` to the cluster at ``row``, moving its centroid."""
+        cluster = self.clusters[row]
+        total = cluster['total_frequency']
+        self.centroids[row] = (self.centroids[row] * total + np.asarray(embedding) * weight) / (total + weight)
+        counts = dict(zip(cluster['concepts'], cluster['frequency']))
+        counts[concept] = counts.get(concept, 0) + weight
+        ordered = sorted(counts.items(), key=lambda x: x[1], reverse=True)
+        cluster['concepts'] = [item[0] for item in ordered]
+        cluster['frequency'] = [item[1] for item in ordered]
+        cluster['total_frequency'] = total + weight
+
+    def extend(self, clusters, centroids):
+        """Append newly fitted clusters, renumbering them after the existing ids."""
+        next_id = max((cluster['id'] for cluster in self.clusters), default=-1) + 1
+        for offset, cluster in enumerate(clusters):
+            cluster['id'] = next_id + offset
+        if not clusters:
+            return
+        centroids = np.asarray(centroids, dtype=np.float32).reshape(len(clusters), -1)
+        self.clusters.extend(clusters)
+        self.centroids = np.vstack([self.centroids, centroids]) if len(self.centroids) else centroids
@@ -0,0 +1,397 @@
+import os
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from sklearn.cluster import DBSCAN, KMeans, MiniBatchKMeans, kmeans_plusplus
+from sklearn.metrics import silhouette_score, pairwise_distances, pairwise_distances_argmin_min
+from threadpoolctl import threadpool_limits
+from neighbor_graph import normalize_rows, cosine_radius_graph
+from embedding_store import EmbeddingStore, iter_row_chunks, CHUNK_ROWS
+import progress
+
+DEFAULT_GRID = {
+    "eps": [0.15, 0.2, 0.25, 0.3, 0.35],
+    "min_samples": [2, 3, 5],
+    "min_freq_threshold": [3],
+}
+SILHOUETTE_SAMPLE_SIZE = 5000
+MAX_NOISE_FRACTION = 0.5
+CRITERION = (
+    "highest cosine silhouette among settings with min_clusters <= clusters <= max_clusters "
+    f"and noise fraction <= {MAX_NOISE_FRACTION}, ties broken by lower noise fraction; "
+    "if no setting qualifies, highest silhouette overall"
+)
+# Below this many rows a k sweep runs in-process; pool start-up would cost more than it saves
+KMEANS_PARALLEL_MIN_ROWS = 2000
+# A memory-mapped matrix or EmbeddingStore with at least this many rows is swept with
+# fit_kmeans_chunked, which never holds more than one chunk of it in memory
+CHUNKED_KMEANS_MIN_ROWS = 100000
+
+# Per-worker state set up by attach_shared
+_worker = {}
+
+
+def attach_shared(shm_name, shape, dtype, weights):
+    """Pool initializer: map the shared embedding matrix and pin BLAS to one thread."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm
+    _worker["embeddings"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _worker["weights"] = weights
+    # Processes supply the parallelism; nested BLAS threads would oversubscribe the cores
+    _worker["limits"] = threadpool_limits(1)
+
+
+def evaluate_eps(settings):
+    """Pool task: run every grid point sharing one eps on a single cosine graph built for that eps."""
+    graph = cosine_radius_graph(_worker["embeddings"], settings[0]["eps"])
+    return [evaluate_setting(setting, graph) for setting in settings]
+
+
+def evaluate_setting(setting, graph):
+    """Run DBSCAN plus small-cluster merging for one grid point and score the result.
+
+    The noise fraction and the silhouette are both weighted by concept
+    frequency. The silhouette is ``weighted_silhouette`` over cosine
+    distances for a stratified sample of SILHOUETTE_SAMPLE_SIZE rows.
+    """
+    from concept_clustering import group_by_label, merge_small_clusters
+
+    embeddings = _worker["embeddings"]
+    weights = _worker["weights"]
+    labels = DBSCAN(eps=setting["eps"], min_samples=setting["min_samples"], metric='precomputed').fit_predict(
+        graph, sample_weight=weights
+    )
+    noise_fraction = float(weights[labels == -1].sum() / weights.sum())
+
+    clusters_dict = merge_small_clusters(group_by_label(labels), embeddings, weights, setting["min_freq_threshold"])
+    final_labels = np.empty(len(labels), dtype=np.int64)
+    for position, indices in enumerate(clusters_dict.values()):
+        final_labels[indices] = position
+
+    n_clusters = len(clusters_dict)
+    silhouette = None
+    sample = stratified_sample(final_labels, SILHOUETTE_SAMPLE_SIZE)
+    sampled = final_labels[sample]
+    if 2 <= len(np.unique(sampled)) < weights[sample].sum():
+        distances = pairwise_distances(embeddings[sample], metric='cosine')
+        silhouette = weighted_silhouette(distances, sampled, weights[sample])
+    return {**setting, "n_clusters": n_clusters, "noise_fraction": noise_fraction, "silhouette": silhouette}
+
+
+def choose_setting(results, min_clusters, max_clusters):
+    """Pick a sweep result according to CRITERION."""
+    scored = [r for r in results if r["silhouette"] is not None]
+    eligible = [
+        r for r in scored
+        if min_clusters <= r["n_clusters"] <= max_clusters and r["noise_fraction"] <= MAX_NOISE_FRACTION
+    ]
+    candidates = eligible or scored or results
+    return max(candidates, key=lambda r: (
+        r["silhouette"] if r["silhouette"] is not None else -np.inf, -r["noise_fraction"]
+    ))
+
+
+@contextlib.contextmanager
+def shared_pool(matrix, weights, max_workers):
+    """Process pool whose workers all map one shared-memory copy of ``matrix``."""
+    shm = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+    try:
+        np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=shm.buf)[:] = matrix
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=attach_shared,
+            initargs=(shm.name, matrix.shape, matrix.dtype, weights),
+        ) as pool:
+            yield pool
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def sweep_dbscan(embeddings, weights, grid=None, min_clusters=4, max_clusters=16, max_workers=None):
+    """Evaluate a grid of DBSCAN settings in parallel over one shared embedding matrix.
+
+    ``grid`` maps eps, min_samples and min_freq_threshold to candidate values
+    (missing keys use DEFAULT_GRID). The normalized float32 embeddings are
+    copied once into shared memory that every worker process maps, so the
+    matrix is neither re-embedded nor pickled per setting. Returns
+    ``(results, best)``: one dict per setting with n_clusters, noise_fraction
+    and silhouette, and the result chosen by ``choose_setting``. The cosine
+    neighbour graph is built once per eps and reused for every min_samples
+    and min_freq_threshold at that eps.
+    """
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    settings = [
+        {"eps": float(eps), "min_samples": int(min_samples), "min_freq_threshold": int(threshold)}
+        for eps, min_samples, threshold in itertools.product(grid["eps"], grid["min_samples"], grid["min_freq_threshold"])
+    ]
+    # Settings that share an eps share one neighbour graph
+    by_eps = [list(group) for _, group in itertools.groupby(settings, key=lambda setting: setting["eps"])]
+    unit = normalize_rows(embeddings)
+    weights = np.asarray(weights, dtype=np.int64)
+    max_workers = max_workers or min(len(by_eps), os.cpu_count() or 1)
+
+    with shared_pool(unit, weights, max_workers) as pool:
+        results = []
+        for eps_results in pool.map(evaluate_eps, by_eps):
+            results.extend(eps_results)
+            progress.advance(len(results), len(settings))
+
+    return results, choose_setting(results, min_clusters, max_clusters)
+
+
+def fit_kmeans(embeddings, k, n_init=10, random_state=42, weights=None):
+    """Fit KMeans for one k and return (labels, inertia)."""
+    kmeans = KMeans(n_clusters=k, random_state=random_state, n_init=n_init)
+    labels = kmeans.fit_predict(embeddings, sample_weight=weights)
+    return labels, float(kmeans.inertia_)
+
+
+def fit_kmeans_chunked(embeddings, k, random_state=42, weights=None, chunk_rows=CHUNK_ROWS, epochs=2):
+    """Fit MiniBatchKMeans one chunk of rows at a time and return (labels, inertia).
+
+    The centres start from k-means++ on a random ``chunk_rows`` rows. Each
+    of ``epochs`` passes then feeds the chunks to ``partial_fit`` in order,
+    and a last pass assigns labels and sums the inertia. ``embeddings`` can
+    be an array, a memory map or an EmbeddingStore.
+    """
+    weights = np.ones(len(embeddings), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+    labels, squared = kmeans_chunked_distances(embeddings, k, random_state, weights, chunk_rows, epochs)
+    return labels, float(np.dot(weights, squared))
+
+
+def kmeans_chunked_distances(embeddings, k, random_state, weights, chunk_rows=CHUNK_ROWS, epochs=2, rows=None):
+    """The chunked fit of ``fit_kmeans_chunked``, restricted to the sorted row IDs ``rows`` when given.
+
+    Every pass still walks the whole matrix chunk by chunk and keeps the
+    chunk's rows that are in ``rows``. Returns the label and float64 squared
+    distance to its centre of each selected row, in ``rows`` order.
+    """
+    n = len(embeddings)
+    rows = np.arange(n) if rows is None else np.asarray(rows)
+    selected = np.zeros(n, dtype=bool)
+    selected[rows] = True
+    rng = np.random.default_rng(random_state)
+    init_rows = np.sort(rng.choice(rows, size=min(len(rows), max(chunk_rows, 3 * k)), replace=False))
+    centers, _ = kmeans_plusplus(np.asarray(embeddings[init_rows], dtype=np.float32), k,
+                                 sample_weight=weights[init_rows], random_state=random_state)
+    kmeans = MiniBatchKMeans(n_clusters=k, init=centers, n_init=1, batch_size=chunk_rows,
+                             random_state=random_state)
+
+    def selected_chunks():
+        for start, chunk in iter_row_chunks(embeddings, chunk_rows):
+            keep = selected[start:start + len(chunk)]
+            if keep.any():
+                yield np.asarray(chunk, dtype=np.float32)[keep], weights[start:start + len(chunk)][keep]
+
+    for _ in range(epochs):
+        for chunk, chunk_weights in selected_chunks():
+            kmeans.partial_fit(chunk, sample_weight=chunk_weights)
+
+    labels = np.empty(len(rows), dtype=np.int32)
+    squared = np.empty(len(rows), dtype=np.float64)
+    done = 0
+    for chunk, _ in selected_chunks():
+        chunk_labels, distances = pairwise_distances_argmin_min(chunk, kmeans.cluster_centers_)
+        labels[done:done + len(chunk)] = chunk_labels
+        squared[done:done + len(chunk)] = distances.astype(np.float64) ** 2
+        done += len(chunk)
+    return labels, squared
+
+
+def fit_kmeans_shared(args):
+    """Pool task: fit_kmeans on the shared embedding matrix."""
+    return fit_kmeans(_worker["embeddings"], *args, weights=_worker["weights"])
+
+
+def weighted_silhouette(distances, labels, weights):
+    """Mean silhouette over a precomputed distance matrix where row i stands for ``weights[i]`` identical rows.
+
+    Equal to ``silhouette_score(..., metric='precomputed')`` on the matrix
+    with every row repeated ``weights[i]`` times, without building it.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    _, codes = np.unique(labels, return_inverse=True)
+    rows = np.arange(len(codes))
+    members = np.zeros((len(codes), codes.max() + 1))
+    members[rows, codes] = weights
+    sums = distances @ members
+    cluster_weight = members.sum(axis=0)
+    own_weight = cluster_weight[codes]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = sums[rows, codes] / (own_weight - 1)
+        mean_other = sums / cluster_weight
+        mean_other[rows, codes] = np.inf
+        b = mean_other.min(axis=1)
+        scores = np.nan_to_num((b - a) / np.maximum(a, b))
+    # A row alone in its cluster scores 0, as in silhouette_samples
+    scores[own_weight <= 1] = 0.0
+    return float(np.average(scores, weights=weights))
+
+
+def stratified_sample(labels, size, seed=0):
+    """Sorted row indices, about ``size`` of them, drawn from every label in proportion to its count.
+
+    Each label keeps at least one row. When ``size`` covers every row, all
+    rows are returned.
+    """
+    labels = np.asarray(labels)
+    if size >= len(labels):
+        return np.arange(len(labels))
+    rng = np.random.default_rng(seed)
+    picked = []
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        take = max(1, int(round(size * len(members) / len(labels))))
+        picked.append(rng.choice(members, size=min(take, len(members)), replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+def sweep_kmeans(embeddings, k_values, sample_size=SILHOUETTE_SAMPLE_SIZE, n_init=10, random_state=42, max_workers=None,
+                 weights=None):
+    """Fit KMeans for every k in ``k_values`` and pick the k with the best silhouette.
+
+    The fits run in parallel over one shared embedding matrix. Inputs under
+    KMEANS_PARALLEL_MIN_ROWS rows, or ``max_workers=1``, fit in-process
+    instead. Every k is scored on the same rows: a sample of ``sample_size``
+    rows, stratified by the labels of the largest k, so each cluster at
+    every k is represented. The Euclidean distance block for that sample is
+    computed once and shared by all the scores. With ``sample_size`` at
+    least the number of rows, the scores equal a full ``silhouette_score``.
+    ``weights`` give each row's multiplicity. They are passed to KMeans as
+    ``sample_weight`` and scored with ``weighted_silhouette``, so distinct
+    rows with counts behave like the repeated rows they stand for.
+    Returns ``(results, best_k, best_labels)``. ``results`` holds the k,
+    inertia and silhouette of each fit. ``best_labels`` come from the fit
+    that won, so that k is never refit. Ties go to the smaller k.
+
+    A memory map or EmbeddingStore of CHUNKED_KMEANS_MIN_ROWS rows or more
+    is fitted in-process with ``fit_kmeans_chunked`` instead, and only the
+    sampled rows are read for scoring, so it is never loaded whole.
+    """
+    chunked = isinstance(embeddings, (np.memmap, EmbeddingStore)) and len(embeddings) >= CHUNKED_KMEANS_MIN_ROWS
+    if not chunked:
+        embeddings = np.ascontiguousarray(embeddings)
+    k_values = sorted(k_values)
+    tasks = [(k, n_init, random_state) for k in k_values]
+    max_workers = max_workers or min(len(tasks), os.cpu_count() or 1)
+    if chunked:
+        fits = []
+        for k in k_values:
+            fits.append(fit_kmeans_chunked(embeddings, k, random_state=random_state, weights=weights))
+            progress.advance(len(fits), len(tasks))
+    elif max_workers <= 1 or len(embeddings) < KMEANS_PARALLEL_MIN_ROWS:
+        fits = []
+        for task in tasks:
+            fits.append(fit_kmeans(embeddings, *task, weights=weights))
+            progress.advance(len(fits), len(tasks))
+    else:
+        with shared_pool(embeddings, weights, max_workers) as pool:
+            fits = []
+            for fit in pool.map(fit_kmeans_shared, tasks):
+                fits.append(fit)
+                progress.advance(len(fits), len(tasks))
+
+    return score_partitions(embeddings, k_values, fits, sample_size, random_state, weights)
+
+
+def score_partitions(embeddings, k_values, fits, sample_size, random_state=42, weights=None):
+    """Score each ``(labels, inertia)`` in ``fits`` on one sample and pick the best k, as sweep_kmeans describes.
+
+    The sample is stratified by the labels of the last fit, which should be
+    the one with the most clusters.
+    """
+    sample = stratified_sample(fits[-1][0], sample_size, seed=random_state)
+    distances = pairwise_distances(embeddings[sample])
+    sample_weights = None if weights is None else np.asarray(weights)[sample]
+    n_sampled = len(sample) if weights is None else sample_weights.sum()
+    results = []
+    for k, (labels, inertia) in zip(k_values, fits):
+        sampled = labels[sample]
+        silhouette = None
+        if 2 <= len(np.unique(sampled)) < n_sampled:
+            if weights is None:
+                silhouette = float(silhouette_score(distances, sampled, metric='precomputed'))
+            else:
+                silhouette = weighted_silhouette(distances, sampled, sample_weights)
+        results.append({"k": k, "inertia": inertia, "silhouette": silhouette})
+
+    best = max(range(len(results)), key=lambda i: (
+        results[i]["silhouette"] if results[i]["silhouette"] is not None else -np.inf, -i
+    ))
+    return results, k_values[best], fits[best][0]
+
+
+def bisect_kmeans(embeddings, k_values, n_init=3, random_state=42, weights=None):
+    """Nested partitions for every k in ``k_values`` from one top-down bisecting k-means pass.
+
+    Starting from a single cluster, each step splits the cluster with the
+    largest weighted inertia in two with KMeans, fitted on that cluster's
+    rows only. The partition after each step is kept when its cluster count
+    is in ``k_values``, so every k refines the one before it. Returns a
+    ``(labels, inertia)`` pair per k, in ``sorted(k_values)`` order, and stops
+    early when no cluster can be split further.
+
+    On a memory map or EmbeddingStore, a cluster of CHUNKED_KMEANS_MIN_ROWS
+    rows or more is split with the chunked MiniBatchKMeans fit of
+    ``fit_kmeans_chunked`` instead, so its rows are never read into memory
+    at once. Smaller clusters are read and split with KMeans as usual.
+    """
+    n = len(embeddings)
+    chunked = isinstance(embeddings, (np.memmap, EmbeddingStore))
+    weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+    k_values = sorted(k_values)
+    labels = np.zeros(n, dtype=np.int32)
+
+    # Weighted inertia of the single starting cluster, in chunks so no float64 copy of the matrix is made
+    mean = sum(weights[start:start + len(chunk)] @ chunk for start, chunk in iter_row_chunks(embeddings))
+    mean = mean / weights.sum()
+    inertias = [sum(
+        float(weights[start:start + len(chunk)] @ ((chunk - mean) ** 2).sum(axis=1))
+        for start, chunk in iter_row_chunks(embeddings)
+    )]
+    members = [np.arange(n)]
+    fits = []
+    while True:
+        if len(members) in k_values:
+            fits.append((labels.copy(), float(sum(inertias))))
+            progress.advance(len(fits), len(k_values))
+        splittable = [c for c in range(len(members)) if len(members[c]) >= 2 and inertias[c] > 0]
+        if len(members) >= k_values[-1] or not splittable:
+            break
+        target = max(splittable, key=lambda c: inertias[c])
+        rows = members[target]
+        if chunked and len(rows) >= CHUNKED_KMEANS_MIN_ROWS:
+            halves, squared = kmeans_chunked_distances(embeddings, 2, random_state, weights, rows=rows)
+        else:
+            points = embeddings[rows]
+            kmeans = KMeans(n_clusters=2, random_state=random_state, n_init=n_init)
+            kmeans.fit(points, sample_weight=weights[rows])
+            halves = kmeans.labels_
+            squared = kmeans.transform(points)[np.arange(len(rows)), halves].astype(np.float64) ** 2
+        # Each half's share of the split's inertia, measured to its own centre as KMeans.inertia_ is
+        row_inertia = weights[rows] * squared
+        labels[rows[halves == 1]] = len(members)
+        members[target], inertias[target] = rows[halves == 0], float(row_inertia[halves == 0].sum())
+        members.append(rows[halves == 1])
+        inertias.append(float(row_inertia[halves == 1].sum()))
+    return fits
+
+
+def sweep_bisecting(embeddings, k_values, sample_size=SILHOUETTE_SAMPLE_SIZE, n_init=3, random_state=42,
+                    weights=None):
+    """sweep_kmeans with the fits taken from one ``bisect_kmeans`` pass instead of a KMeans fit per k.
+
+    Costs about as much as one KMeans fit, since each bisection only sees
+    the rows of the cluster it splits. The partitions are scored the same
+    way and the return value has the same shape. k values the pass could
+    not reach are left out.
+    """
+    fits = bisect_kmeans(embeddings, k_values, n_init=n_init, random_state=random_state, weights=weights)
+    if not fits:
+        raise ValueError("Bisecting k-means produced none of the requested cluster counts")
+    k_values = sorted(k_values)[:len(fits)]
+    return score_partitions(embeddings, k_values, fits, sample_size, random_state, weights)
@@ -2,131 +2,304 @@ import os
 import json
 import sys
 import numpy as np
-import requests
 from collections import Counter
-from sklearn.cluster import DBSCAN, KMeans
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.stem import WordNetLemmatizer
-from nltk import word_tokenize
-
-API_URL = "https://api-inference.huggingface.co/pipeline/feature-extraction/sentence-transformers/all-MiniLM-L6-v2"
+from functools import lru_cache
+from embedding_cache import cached_embeddings
+from embedding_backends import get_backend
+from neighbor_graph import cosine_radius_graph
+from cluster_model import ClusterModel
+import progress
 
 def get_embeddings(texts, hf_api_key):
-    if not hf_api_key:
-        raise RuntimeError("Missing Hugging Face API key")
-    headers = {"Authorization": f"Bearer {hf_api_key}"}
-    payload = {"inputs": texts, "options": {"wait_for_model": True}}
-    resp = requests.post(API_URL, headers=headers, json=payload)
-    resp.raise_for_status()
-    embs = np.array(resp.json())
-    # pool token embeddings if returned as [batch, tokens, dim]
-    if embs.ndim == 3:
-        embs = embs.mean(axis=1)
-    return embs
-
-lemmatizer = WordNetLemmatizer()
+    """Embed texts with the configured backend, skipping those already in the local cache."""
+    backend = get_backend(hf_api_key=hf_api_key)
+    with progress.stage("embedding"):
+        return cached_embeddings(texts, backend.cache_key, backend.embed)
+
+CLUSTER_PARAMS = {"eps": 0.25, "min_samples": 2, "min_freq_threshold": 3, "max_clusters": 16, "min_clusters": 4}
+ENGINES = ("dbscan", "hierarchical")
+# linkage keeps an n*(n-1)/2 float64 distance matrix (about 400 MB at 10000
+# rows), so above this many unique concepts the hierarchical engine falls
+# back to the DBSCAN/KMeans path
+HIERARCHICAL_MAX_ROWS = 10000
+# KMeans refits over more rows than minibatch_threshold use MiniBatchKMeans
+KMEANS_OPTIONS = {"minibatch_threshold": 10000, "batch_size": 1024, "reassignment_ratio": 0.01}
+# Cosine similarity a new concept needs to join a saved cluster. A fitted model
+# stores 1 - the eps it was clustered at, so assignment is never looser than its
+# clustering radius; this default (1 - CLUSTER_PARAMS["eps"]) covers models saved without one.
+DEFAULT_ASSIGN_THRESHOLD = 0.75
+
+# sklearn, scipy and nltk are imported inside the functions that use them so
+# that starting the script (and the worker) stays cheap until they are needed.
+_lemmatizer = None
+
+NORMALIZE_CACHE_SIZE = 65536
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def lemmatize_token(token: str) -> str:
+    global _lemmatizer
+    if _lemmatizer is None:
+        from nltk.stem import WordNetLemmatizer
+        _lemmatizer = WordNetLemmatizer()
+    return _lemmatizer.lemmatize(token)
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_concept(concept: str) -> str:
+    from nltk import word_tokenize
     tokens = word_tokenize(concept.lower())
-    lemmas = [lemmatizer.lemmatize(t) for t in tokens]
+    lemmas = [lemmatize_token(t) for t in tokens]
     return " ".join(lemmas)
 
-def get_best_label(concepts, hf_api_key):
-    """Find the most representative concept using cosine similarity to centroid."""
-    if not concepts:
+class ConceptVocabulary:
+    """Interns normalized concepts and assigns them dense integer ids in first-seen order."""
+
+    def __init__(self):
+        self.concepts = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.concepts)
+
+    def intern(self, normalized):
+        concept_id = self.ids.get(normalized)
+        if concept_id is None:
+            concept_id = len(self.concepts)
+            self.ids[normalized] = concept_id
+            self.concepts.append(normalized)
+        return concept_id
+
+    def normalize(self, raw_concepts):
+        """Normalize a batch of raw concept strings and return their ids as an array."""
+        raw_ids = {raw: self.intern(normalize_concept(raw)) for raw in dict.fromkeys(raw_concepts)}
+        return np.array([raw_ids[raw] for raw in raw_concepts], dtype=np.int64)
+
+def get_best_label(concepts, embeddings, indices, weights=None):
+    """Find the most representative concept using cosine similarity to centroid.
+
+    ``indices`` are rows of the already-computed ``embeddings`` matrix, so no
+    extra embedding requests are made.
+    """
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    if len(indices) == 0:
         return ""
-    embeddings = get_embeddings(concepts, hf_api_key)
-    centroid = np.mean(embeddings, axis=0).reshape(1, -1)
-    similarities = cosine_similarity(embeddings, centroid).flatten()
-    best_index = similarities.argmax()
+    indices = np.asarray(indices)
+    member_embeddings = embeddings[indices]
+    member_weights = None if weights is None else np.asarray(weights)[indices]
+    centroid = np.average(member_embeddings, axis=0, weights=member_weights).reshape(1, -1)
+    similarities = cosine_similarity(member_embeddings, centroid).flatten()
+    best_index = indices[similarities.argmax()]
     return concepts[best_index]
 
-def process_clustering(concept_frequencies, eps=0.25, min_samples=2, min_freq_threshold=3, max_clusters=16, min_clusters=4, hf_api_key=None):
+def group_by_label(labels):
+    clusters_dict = {}
+    for idx, label in enumerate(labels):
+        clusters_dict.setdefault(label, []).append(idx)
+    return clusters_dict
+
+def merge_small_clusters(clusters_dict, embeddings, weights, min_freq_threshold, min_clusters=1):
+    """Absorb clusters lighter than ``min_freq_threshold`` into their most similar neighbour.
+
+    Small clusters (including DBSCAN noise, label -1) are visited in label
+    order and each joins the surviving cluster whose centroid is most cosine
+    similar to its own, ties going to the earliest label. Centroids are kept
+    as running weighted sums so a merge only refreshes one row of the
+    centroid similarity matrix. Merging stops once only ``min_clusters``
+    clusters remain.
+    """
+    labels = list(clusters_dict.keys())
+    members = [list(clusters_dict[label]) for label in labels]
+    sums = np.stack([(embeddings[idx] * weights[idx, None]).sum(axis=0) for idx in members]).astype(np.float64)
+    totals = np.array([weights[idx].sum() for idx in members], dtype=np.float64)
+
+    def unit_centroids(rows):
+        centroids = sums[rows] / totals[rows, None]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return centroids / norms
+
+    units = unit_centroids(np.arange(len(labels)))
+    similarity = units @ units.T
+    alive = np.ones(len(labels), dtype=bool)
+    n_alive = len(labels)
+    small = [pos for pos in range(len(labels)) if totals[pos] < min_freq_threshold]
+
+    for pos in small:
+        if n_alive <= min_clusters:
+            break
+        row = np.where(alive, similarity[pos], -np.inf)
+        row[pos] = -np.inf
+        best = int(np.argmax(row))
+        if not row[best] > -1:
+            continue
+        members[best].extend(members[pos])
+        sums[best] += sums[pos]
+        totals[best] += totals[pos]
+        alive[pos] = False
+        n_alive -= 1
+        units[best] = unit_centroids([best])[0]
+        similarity[best] = units @ units[best]
+        similarity[:, best] = similarity[best]
+
+    return {labels[pos]: members[pos] for pos in range(len(labels)) if alive[pos]}
+
+def hierarchical_clusters(embeddings, weights, eps, min_freq_threshold, min_clusters, max_clusters):
+    """Cluster with one average-linkage tree cut to land within [min_clusters, max_clusters].
+
+    The tree is built once over the unique concept embeddings using cosine
+    distance. It is cut at ``eps`` when that gives an allowed number of
+    clusters, otherwise at the nearest bound. Small clusters are then merged
+    without going below ``min_clusters``. The tree takes memory quadratic in
+    the number of rows, so process_clustering only calls this up to
+    HIERARCHICAL_MAX_ROWS rows.
+    """
+    from scipy.cluster.hierarchy import linkage, fcluster
+
+    n = len(embeddings)
+    if n < 2:
+        return group_by_label(np.zeros(n, dtype=np.int64))
+    tree = linkage(embeddings, method='average', metric='cosine')
+    n_at_eps = len(np.unique(fcluster(tree, t=eps, criterion='distance')))
+    n_clusters = min(max(n_at_eps, min_clusters), max_clusters, n)
+    labels = fcluster(tree, t=n_clusters, criterion='maxclust')
+    clusters_dict = group_by_label(labels)
+    return merge_small_clusters(clusters_dict, embeddings, weights, min_freq_threshold, min_clusters=min(min_clusters, n_clusters))
+
+def kmeans_labels(embeddings, weights, n_clusters, minibatch_threshold=None, batch_size=None, reassignment_ratio=None):
+    """Fit KMeans, switching to MiniBatchKMeans once there are more than ``minibatch_threshold`` rows."""
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    minibatch_threshold = KMEANS_OPTIONS["minibatch_threshold"] if minibatch_threshold is None else minibatch_threshold
+    if len(embeddings) > minibatch_threshold:
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            batch_size=batch_size or KMEANS_OPTIONS["batch_size"],
+            reassignment_ratio=KMEANS_OPTIONS["reassignment_ratio"] if reassignment_ratio is None else reassignment_ratio,
+            n_init=3,
+            random_state=0,
+        )
+    else:
+        kmeans = KMeans(n_clusters=n_clusters, random_state=0)
+    return kmeans.fit_predict(embeddings, sample_weight=weights)
+
+def concept_weights(concept_frequencies, vocabulary):
+    """Collapse (concept, freq) pairs into unique normalized concepts and summed weights.
+
+    Concepts keep first-seen order; non-positive frequencies are dropped.
+    """
+    freqs = np.array([freq for _, freq in concept_frequencies], dtype=np.int64)
+    ids = vocabulary.normalize([concept for concept, _ in concept_frequencies])
+    ids, freqs = ids[freqs > 0], freqs[freqs > 0]
+    unique_ids = np.array(list(dict.fromkeys(ids.tolist())), dtype=np.int64)
+    weights = np.bincount(ids, weights=freqs, minlength=len(vocabulary))[unique_ids].astype(np.int64)
+    return [vocabulary.concepts[i] for i in unique_ids], weights
+
+def process_clustering(concept_frequencies, eps=0.25, min_samples=2, min_freq_threshold=3, max_clusters=16, min_clusters=4, hf_api_key=None, weighted=True, vocabulary=None, return_centroids=False, engine="dbscan", kmeans_options=None, embeddings=None):
+    """Cluster (concept, frequency) pairs into labelled concept clusters.
+
+    In weighted mode each unique normalized concept is embedded once and its
+    frequency is passed to the clusterers as a sample weight; otherwise
+    concepts are expanded into one row per occurrence. Returns the clusters
+    and a normalized concept -> cluster id map, plus an array of weighted
+    cluster centroids when ``return_centroids`` is set.
+
+    ``engine`` "dbscan" runs DBSCAN and falls back to KMeans refits when the
+    cluster count leaves [min_clusters, max_clusters]; "hierarchical" fits a
+    single linkage tree and cuts it within those bounds instead. Above
+    HIERARCHICAL_MAX_ROWS clustered rows "hierarchical" runs the "dbscan"
+    path, since the tree needs quadratic memory.
+    ``kmeans_options`` overrides KMEANS_OPTIONS for those KMeans refits.
+    ``embeddings`` reuses rows already computed for the concepts (in
+    ``concept_weights`` order, as ``sweep_parameters`` returns them) instead
+    of embedding them again; it requires weighted mode.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown clustering engine '{engine}'. Expected one of: {', '.join(ENGINES)}")
     if not concept_frequencies:
-        return [], {}
+        return ([], {}, np.empty((0, 0))) if return_centroids else ([], {})
 
-    # Normalize and expand concepts by frequency
-    concepts = []
-    for concept, freq in concept_frequencies:
-        normalized = normalize_concept(concept)
-        concepts.extend([normalized] * freq)
+    if vocabulary is None:
+        vocabulary = ConceptVocabulary()
+    if weighted:
+        concepts, weights = concept_weights(concept_frequencies, vocabulary)
+    else:
+        freqs = np.array([freq for _, freq in concept_frequencies], dtype=np.int64)
+        ids = vocabulary.normalize([concept for concept, _ in concept_frequencies])
+        concepts = [vocabulary.concepts[i] for i in np.repeat(ids, np.maximum(freqs, 0))]
+        weights = np.ones(len(concepts), dtype=np.int64)
 
-    embeddings = get_embeddings(concepts, hf_api_key)
+    if not concepts:
+        return ([], {}, np.empty((0, 0))) if return_centroids else ([], {})
+
+    if embeddings is None:
+        embeddings = get_embeddings(concepts, hf_api_key)
+    elif not weighted or len(embeddings) != len(concepts):
+        raise ValueError(f"Expected {len(concepts)} precomputed embeddings for the weighted concepts, got {len(embeddings)}")
+
+    def fit_kmeans(n_clusters):
+        labels = kmeans_labels(embeddings, weights, min(n_clusters, len(concepts)), **(kmeans_options or {}))
+        return group_by_label(labels)
+
+    if engine == "hierarchical" and len(embeddings) > HIERARCHICAL_MAX_ROWS:
+        print(f"{len(embeddings)} rows exceed HIERARCHICAL_MAX_ROWS ({HIERARCHICAL_MAX_ROWS}); "
+              "clustering with DBSCAN instead", file=sys.stderr)
+        engine = "dbscan"
 
     try:
-        dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='cosine')
-        labels = dbscan.fit_predict(embeddings)
-
-        clusters_dict = {}
-        for idx, label in enumerate(labels):
-            clusters_dict.setdefault(label, []).append(idx)
-
-        cluster_centroids = {label: np.mean(embeddings[indices], axis=0) for label, indices in clusters_dict.items()}
-
-        small_labels = [label for label, indices in clusters_dict.items() if len(indices) < min_freq_threshold]
-        for small_label in small_labels:
-            if len(clusters_dict) == 1:
-                break
-            small_centroid = cluster_centroids[small_label].reshape(1, -1)
-            best_label = None
-            best_sim = -1
-            for label, centroid in cluster_centroids.items():
-                if label == small_label:
-                    continue
-                sim = cosine_similarity(small_centroid, centroid.reshape(1, -1))[0][0]
-                if sim > best_sim:
-                    best_sim = sim
-                    best_label = label
-            if best_label is not None:
-                clusters_dict[best_label].extend(clusters_dict[small_label])
-                del clusters_dict[small_label]
-                cluster_centroids[best_label] = np.mean(embeddings[clusters_dict[best_label]], axis=0)
-                del cluster_centroids[small_label]
-
-        if len(clusters_dict) > max_clusters:
-            kmeans = KMeans(n_clusters=max_clusters, random_state=0)
-            kmeans_labels = kmeans.fit_predict(embeddings)
-            clusters_dict = {}
-            for idx, label in enumerate(kmeans_labels):
-                clusters_dict.setdefault(label, []).append(idx)
-            cluster_centroids = {label: np.mean(embeddings[indices], axis=0) for label, indices in clusters_dict.items()}
-        
-        if len(clusters_dict) < min_clusters and len(concepts) > min_clusters:
-            kmeans = KMeans(n_clusters=min_clusters, random_state=0)
-            kmeans_labels = kmeans.fit_predict(embeddings)
-            clusters_dict = {}
-            for idx, label in enumerate(kmeans_labels):
-                clusters_dict.setdefault(label, []).append(idx)
-            cluster_centroids = {label: np.mean(embeddings[indices], axis=0) for label, indices in clusters_dict.items()}
+        if engine == "hierarchical":
+            clusters_dict = hierarchical_clusters(embeddings, weights, eps, min_freq_threshold, min_clusters, max_clusters)
+        else:
+            from sklearn.cluster import DBSCAN
+
+            graph = cosine_radius_graph(embeddings, eps)
+            dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed')
+            labels = dbscan.fit_predict(graph, sample_weight=weights)
+
+            clusters_dict = group_by_label(labels)
+            clusters_dict = merge_small_clusters(clusters_dict, embeddings, weights, min_freq_threshold)
+
+            if len(clusters_dict) > max_clusters:
+                clusters_dict = fit_kmeans(max_clusters)
+
+            if len(clusters_dict) < min_clusters and weights.sum() > min_clusters:
+                clusters_dict = fit_kmeans(min_clusters)
 
         clusters = []
+        centroids = []
         for label, indices in clusters_dict.items():
-            cluster_list = [concepts[i] for i in indices]
-            concept_counts = Counter(cluster_list)
+            indices = sorted(indices)
+            concept_counts = Counter()
+            for i in indices:
+                concept_counts[concepts[i]] += int(weights[i])
             sorted_items = sorted(concept_counts.items(), key=lambda x: x[1], reverse=True)
 
-            best_label = get_best_label(cluster_list, hf_api_key)
+            best_label = get_best_label(concepts, embeddings, indices, weights)
 
             clusters.append({
                 'id': label,
                 'concepts': [item[0] for item in sorted_items],
                 'frequency': [item[1] for item in sorted_items],
-                'total_frequency': len(cluster_list),
+                'total_frequency': int(weights[indices].sum()),
                 'label': best_label
             })
+            centroids.append(np.average(embeddings[indices], axis=0, weights=weights[indices]))
 
-        clusters.sort(key=lambda x: x['total_frequency'], reverse=True)
+        order = sorted(range(len(clusters)), key=lambda i: clusters[i]['total_frequency'], reverse=True)
+        clusters = [clusters[i] for i in order]
         for i, cluster in enumerate(clusters):
             cluster['id'] = i
 
         new_concept_to_cluster = {concept: cluster['id'] for cluster in clusters for concept in cluster['concepts']}
 
+        if return_centroids:
+            return clusters, new_concept_to_cluster, np.array([centroids[i] for i in order])
         return clusters, new_concept_to_cluster
 
     except Exception as e:
         print(f"Error during clustering: {e}", file=sys.stderr)
-        freq_count = Counter(concepts)
+        freq_count = Counter()
+        for concept, weight in zip(concepts, weights):
+            freq_count[concept] += int(weight)
         cluster = {
             'id': 0,
             'concepts': list(freq_count.keys()),
@@ -134,44 +307,194 @@ def process_clustering(concept_frequencies, eps=0.25, min_samples=2, min_freq_th
             'label': list(freq_count.keys())[0] if freq_count else "",
             'total_frequency': sum(freq_count.values())
         }
+        if return_centroids:
+            return [cluster], {c: 0 for c in concepts}, np.average(embeddings, axis=0, weights=weights).reshape(1, -1)
         return [cluster], {c: 0 for c in concepts}
 
+def assign_concepts(model, concept_frequencies, vocabulary, hf_api_key=None, threshold=None):
+    """Add new concepts to a fitted ClusterModel, keeping existing cluster ids.
+
+    Concepts already in a cluster stay there, other concepts join the most
+    similar centroid when its cosine similarity reaches ``threshold`` and
+    the rest are clustered among themselves into clusters with new ids.
+    Frequencies accumulate onto the model, which is updated in place.
+    """
+    if threshold is None:
+        threshold = model.params.get("assign_threshold", DEFAULT_ASSIGN_THRESHOLD)
+    backend = get_backend(hf_api_key=hf_api_key)
+    if backend.cache_key != model.embedding_key:
+        raise ValueError(f"Cluster model was built with '{model.embedding_key}' embeddings, not '{backend.cache_key}'")
+
+    concepts, weights = concept_weights(concept_frequencies, vocabulary)
+    if concepts:
+        embeddings = get_embeddings(concepts, hf_api_key)
+        row_of_id = {cluster['id']: row for row, cluster in enumerate(model.clusters)}
+        known = model.concept_to_cluster
+        rows, similarities = model.nearest(embeddings)
+        leftovers = []
+        for i, concept in enumerate(concepts):
+            if concept in known:
+                model.add(row_of_id[known[concept]], concept, int(weights[i]), embeddings[i])
+            elif similarities[i] >= threshold:
+                model.add(rows[i], concept, int(weights[i]), embeddings[i])
+            else:
+                leftovers.append((concept, int(weights[i])))
+
+        if leftovers:
+            fit_params = {k: v for k, v in model.params.items() if k != "assign_threshold"}
+            fit_params["min_clusters"] = 1
+            new_clusters, _, new_centroids = process_clustering(
+                leftovers, hf_api_key=hf_api_key, vocabulary=vocabulary, return_centroids=True, **fit_params
+            )
+            model.extend(new_clusters, new_centroids)
+
+    return model.clusters, model.concept_to_cluster
+
+def sweep_parameters(concept_frequencies, vocabulary, hf_api_key=None, grid=None):
+    """Score DBSCAN settings over the concepts' embeddings, computed once, across a process pool.
+
+    Returns the sweep report and the embedding matrix, so the final fit can
+    reuse it through ``process_clustering(..., embeddings=...)``.
+    """
+    from clustering_sweep import sweep_dbscan, CRITERION
+
+    concepts, weights = concept_weights(concept_frequencies, vocabulary)
+    if not concepts:
+        defaults = {key: CLUSTER_PARAMS[key] for key in ("eps", "min_samples", "min_freq_threshold")}
+        return {"criterion": CRITERION, "results": [], "best": defaults}, None
+    embeddings = get_embeddings(concepts, hf_api_key)
+    with progress.stage("dbscan_sweep"):
+        results, best = sweep_dbscan(
+            embeddings, weights, grid,
+            min_clusters=CLUSTER_PARAMS["min_clusters"], max_clusters=CLUSTER_PARAMS["max_clusters"],
+        )
+    return {"criterion": CRITERION, "results": results, "best": best}, embeddings
+
+def demographic_cluster_totals(demographic_lists, vocabulary, concept_to_cluster, n_clusters):
+    """Sum concept frequencies per cluster for every demographic group at once.
+
+    Builds a sparse (group x concept) count matrix and a sparse
+    (concept x cluster) assignment matrix over the shared vocabulary; their
+    product holds each group's cluster totals. Concepts outside every
+    cluster are dropped. Returns a dense (group x cluster) integer array.
+    """
+    from scipy import sparse
+
+    rows, concept_ids, freqs = [], [], []
+    for row, demo_concepts in enumerate(demographic_lists):
+        rows.extend([row] * len(demo_concepts))
+        concept_ids.extend(vocabulary.normalize([concept for concept, _ in demo_concepts]).tolist())
+        freqs.extend(freq for _, freq in demo_concepts)
+
+    assigned = [(vocabulary.intern(concept), cluster_id) for concept, cluster_id in concept_to_cluster.items()]
+    n_concepts = len(vocabulary)
+    counts = sparse.csr_matrix(
+        (np.array(freqs, dtype=np.int64), (np.array(rows, dtype=np.int64), np.array(concept_ids, dtype=np.int64))),
+        shape=(len(demographic_lists), n_concepts),
+    )
+    assignment = sparse.csr_matrix(
+        (np.ones(len(assigned), dtype=np.int64),
+         ([concept_id for concept_id, _ in assigned], [cluster_id for _, cluster_id in assigned])),
+        shape=(n_concepts, n_clusters),
+    )
+    return (counts @ assignment).toarray()
+
 def cluster_concepts(input_data):
+    """Cluster the overall concept frequencies and total each demographic group per cluster.
+
+    ``clusteringEngine`` selects the process_clustering engine ("dbscan" by
+    default). With ``clusterModelPath`` set the fitted clusters are saved there. When
+    ``mode`` is "assign" and that file exists, the input is instead added to
+    the saved clusters via ``assign_concepts`` so existing ids stay stable.
+
+    ``outputFormat`` "compact" emits the cluster table once under ``all``
+    and gives each demographic a list of totals aligned with ``clusterIds``
+    instead of a full copy of every cluster; ``expand_compact_output``
+    restores the default shape. ``mode`` "sweep" first scores a grid of
+    DBSCAN settings (``sweepGrid``) with ``sweep_parameters``, clusters with
+    the chosen one and reports the sweep under ``sweep``.
+    """
     hf_api_key = input_data.get("userApiKeys", {}).get("huggingface")
     all_concepts = input_data.get("all", [])
     demographic_data = input_data.get("demographics", {}) or {"baseline": all_concepts}
+    model_path = input_data.get("clusterModelPath")
 
-    all_clusters, concept_to_cluster = process_clustering(all_concepts, hf_api_key=hf_api_key)
-
-    demographic_clusters = {}
-    for demo, demo_concepts in demographic_data.items():
-        cluster_freq = {cluster['id']: 0 for cluster in all_clusters}
-        for concept, freq in demo_concepts:
-            normalized = normalize_concept(concept)
-            cluster_id = concept_to_cluster.get(normalized, None)
-            if cluster_id is not None:
-                cluster_freq[cluster_id] += freq
-
-        demo_clusters = []
-        for cluster in all_clusters:
-            cid = cluster['id']
-            demo_clusters.append({
-                'id': cid,
-                'concepts': cluster['concepts'],
-                'frequency': cluster['frequency'],
-                'total_frequency': cluster_freq[cid],
-                'label': cluster['label']
-            })
-        demographic_clusters[demo] = demo_clusters
+    vocabulary = ConceptVocabulary()
+    sweep_report = None
+    if input_data.get("mode") == "assign" and model_path and os.path.exists(model_path):
+        model = ClusterModel.load(model_path)
+        with progress.stage("assign"):
+            all_clusters, concept_to_cluster = assign_concepts(model, all_concepts, vocabulary, hf_api_key)
+    else:
+        fit_params = {**CLUSTER_PARAMS, "engine": input_data.get("clusteringEngine", "dbscan")}
+        sweep_embeddings = None
+        if input_data.get("mode") == "sweep":
+            sweep_report, sweep_embeddings = sweep_parameters(all_concepts, vocabulary, hf_api_key, input_data.get("sweepGrid"))
+            best = sweep_report["best"]
+            fit_params.update({key: best[key] for key in ("eps", "min_samples", "min_freq_threshold")})
+        with progress.stage("clustering"):
+            all_clusters, concept_to_cluster, centroids = process_clustering(
+                all_concepts, hf_api_key=hf_api_key, vocabulary=vocabulary, return_centroids=True,
+                embeddings=sweep_embeddings, **fit_params
+            )
+        params = {**fit_params, "assign_threshold": 1.0 - fit_params["eps"]}
+        model = ClusterModel(all_clusters, centroids, params, get_backend(hf_api_key=hf_api_key).cache_key)
+    if model_path:
+        model.save(model_path)
+
+    demo_names = list(demographic_data.keys())
+    demo_totals = demographic_cluster_totals(
+        [demographic_data[demo] for demo in demo_names], vocabulary, concept_to_cluster,
+        max((cluster['id'] for cluster in all_clusters), default=-1) + 1
+    )
+
+    if input_data.get("outputFormat") == "compact":
+        cluster_ids = [cluster['id'] for cluster in all_clusters]
+        result = {
+            "format": "compact",
+            "all": all_clusters,
+            "clusterIds": cluster_ids,
+            "demographics": {demo: demo_totals[row, cluster_ids].tolist() for row, demo in enumerate(demo_names)},
+        }
+    else:
+        demographic_clusters = {}
+        for row, demo in enumerate(demo_names):
+            cluster_freq = demo_totals[row]
+            demo_clusters = []
+            for cluster in all_clusters:
+                cid = cluster['id']
+                demo_clusters.append({
+                    'id': cid,
+                    'concepts': cluster['concepts'],
+                    'frequency': cluster['frequency'],
+                    'total_frequency': int(cluster_freq[cid]),
+                    'label': cluster['label']
+                })
+            demographic_clusters[demo] = demo_clusters
+        result = {"all": all_clusters, "demographics": demographic_clusters}
+
+    if sweep_report is not None:
+        result["sweep"] = sweep_report
+    return result
 
-    return {"all": all_clusters, "demographics": demographic_clusters}
+def expand_compact_output(compact):
+    """Convert the compact cluster_concepts output back to the default shape."""
+    demographics = {}
+    for demo, totals in compact["demographics"].items():
+        demographics[demo] = [
+            {**cluster, 'total_frequency': total} for cluster, total in zip(compact["all"], totals)
+        ]
+    return {"all": compact["all"], "demographics": demographics}
 
 if __name__ == "__main__":
     try:
         input_str = sys.stdin.read()
         input_data = json.loads(input_str)
         clusters = cluster_concepts(input_data)
-        print(json.dumps(clusters))
+        if clusters.get("format") == "compact":
+            print(json.dumps(clusters, separators=(",", ":")))
+        else:
+            print(json.dumps(clusters))
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,129 @@
+import os
+import logging
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+HF_API_URL = "https://api-inference.huggingface.co/pipeline/feature-extraction/{model}"
+
+
+class EmbeddingBackend:
+    """Turns a list of texts into a 2D array of sentence embeddings.
+
+    ``cache_key`` identifies the vectors a backend produces so that the
+    embedding cache never mixes outputs of different models or variants.
+    """
+
+    name = None
+
+    def __init__(self, model_name=DEFAULT_MODEL):
+        self.model_name = model_name
+
+    @property
+    def cache_key(self):
+        return self.model_name
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+
+class HuggingFaceAPIBackend(EmbeddingBackend):
+    """Hosted Hugging Face feature-extraction endpoint, queried in concurrent chunks."""
+
+    name = "huggingface"
+
+    def __init__(self, api_key, model_name=DEFAULT_MODEL, chunk_size=64, max_in_flight=4):
+        super().__init__(model_name)
+        self.api_key = api_key
+        self.api_url = HF_API_URL.format(model=model_name)
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+        self.client = None
+
+    def embed(self, texts):
+        if not self.api_key:
+            raise ValueError("Missing Hugging Face API key")
+        if self.client is None:
+            # hf_client pulls in requests/urllib3, which cached or local runs never need
+            from hf_client import HuggingFaceEmbeddingClient
+
+            self.client = HuggingFaceEmbeddingClient(
+                self.api_url, self.api_key, chunk_size=self.chunk_size, max_in_flight=self.max_in_flight
+            )
+        return self.client.embed(texts)
+
+
+_local_models = {}
+
+
+class LocalBackend(EmbeddingBackend):
+    """In-process sentence-transformers model running on CPU.
+
+    Texts are encoded in batches of ``batch_size``. With ``quantize`` the
+    model's Linear layers are converted to dynamic int8, which trades a
+    little accuracy for faster CPU inference.
+    """
+
+    name = "local"
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=64, quantize=False, device="cpu"):
+        super().__init__(model_name)
+        self.batch_size = batch_size
+        self.quantize = quantize
+        self.device = device
+
+    @property
+    def cache_key(self):
+        return f"{self.model_name}@local-int8" if self.quantize else f"{self.model_name}@local"
+
+    def load_model(self):
+        key = (self.model_name, self.quantize, self.device)
+        if key not in _local_models:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(self.model_name, device=self.device)
+            if self.quantize:
+                import torch
+
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            _local_models[key] = model
+        return _local_models[key]
+
+    def embed(self, texts):
+        model = self.load_model()
+        logging.info(f"Encoding {len(texts)} texts locally (batch size {self.batch_size})")
+        return model.encode(
+            [str(t) for t in texts],
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+
+
+BACKENDS = {backend.name: backend for backend in (HuggingFaceAPIBackend, LocalBackend)}
+
+
+def get_backend(name=None, hf_api_key=None, model_name=None):
+    """Build the configured embedding backend.
+
+    ``name`` defaults to the EMBEDDING_BACKEND environment variable, then to
+    "huggingface". EMBEDDING_BATCH_SIZE sets the local batch size or the
+    texts per Hugging Face request, EMBEDDING_MAX_IN_FLIGHT bounds concurrent
+    Hugging Face requests, EMBEDDING_QUANTIZE ("1" to enable int8) applies
+    to the local backend, and EMBEDDING_MODEL overrides the model for either.
+    """
+    name = name or os.environ.get("EMBEDDING_BACKEND", HuggingFaceAPIBackend.name)
+    model_name = model_name or os.environ.get("EMBEDDING_MODEL", DEFAULT_MODEL)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}'. Expected one of: {', '.join(BACKENDS)}")
+    batch_size = int(os.environ.get("EMBEDDING_BATCH_SIZE", 64))
+    if name == LocalBackend.name:
+        return LocalBackend(
+            model_name,
+            batch_size=batch_size,
+            quantize=os.environ.get("EMBEDDING_QUANTIZE", "0") == "1",
+        )
+    return HuggingFaceAPIBackend(
+        hf_api_key,
+        model_name,
+        chunk_size=batch_size,
+        max_in_flight=int(os.environ.get("EMBEDDING_MAX_IN_FLIGHT", 4)),
+    )
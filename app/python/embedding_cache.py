@@ -0,0 +1,165 @@
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "bias_probing", "embeddings.sqlite3")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Dtype of the arrays cached_embeddings returns; MiniLM vectors lose nothing
+# useful below float32 precision and every later stage runs faster on it.
+EMBEDDING_DTYPE = np.float32
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+)
+"""
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite store of embedding vectors keyed by (model name, text hash).
+
+    Entries are evicted least-recently-used first once the stored vectors
+    exceed ``max_bytes``. Vectors are stored as ``store_dtype`` when given
+    (float16 halves the cache size) and in their own dtype otherwise.
+    ``hits`` and ``misses`` count lookups made through this instance.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, store_dtype=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.store_dtype = np.dtype(store_dtype) if store_dtype else None
+        self.hits = 0
+        self.misses = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(SCHEMA)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self.conn.commit()
+
+    def get_many(self, model, texts):
+        """Return a dict mapping each cached text to its vector."""
+        found = {}
+        hashes = {text_hash(t): t for t in texts}
+        keys = list(hashes)
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT text_hash, dtype, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *chunk],
+            ).fetchall()
+            for h, dtype, blob in rows:
+                found[hashes[h]] = np.frombuffer(blob, dtype=dtype)
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, model, text_hash(t)) for t in found],
+            )
+            self.conn.commit()
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, model, texts, embeddings):
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, embeddings):
+            vector = np.ascontiguousarray(vector, dtype=self.store_dtype)
+            rows.append((model, text_hash(text), vector.dtype.str, vector.tobytes(), vector.nbytes, now))
+        self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+        self.evict()
+
+    def size_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        excess = self.size_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+        freed = 0
+        rows = self.conn.execute("SELECT model, text_hash, nbytes FROM embeddings ORDER BY last_used ASC")
+        victims = []
+        for model, h, nbytes in rows:
+            if freed >= excess:
+                break
+            victims.append((model, h))
+            freed += nbytes
+        self.conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", victims)
+        self.conn.commit()
+        return len(victims)
+
+    def stats(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": self.size_bytes()}
+
+    def close(self):
+        self.conn.close()
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """Shared cache configured from the environment, or None when disabled.
+
+    EMBEDDING_CACHE_PATH overrides the database location (set it to an empty
+    string to disable caching), EMBEDDING_CACHE_MAX_MB bounds its size and
+    EMBEDDING_CACHE_DTYPE (e.g. "float16") sets the storage dtype.
+    """
+    global _default_cache
+    if _default_cache is None:
+        path = os.environ.get("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if not path:
+            return None
+        max_mb = float(os.environ.get("EMBEDDING_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024)))
+        try:
+            _default_cache = EmbeddingCache(
+                path, max_bytes=int(max_mb * 1024 * 1024), store_dtype=os.environ.get("EMBEDDING_CACHE_DTYPE") or None
+            )
+        except (sqlite3.Error, OSError) as e:
+            print(f"Embedding cache unavailable: {e}", file=sys.stderr)
+            return None
+    return _default_cache
+
+
+def cached_embeddings(texts, model, fetch, cache=None):
+    """Embed ``texts`` through ``cache``, calling ``fetch`` only for texts not yet stored.
+
+    ``fetch`` receives a list of unique uncached texts and must return an
+    array with one row per text. Rows come back in the order of ``texts``,
+    as an EMBEDDING_DTYPE array whatever dtype was fetched or stored.
+    """
+    texts = [str(t) for t in texts]
+    if cache is None:
+        cache = get_default_cache()
+    if cache is None:
+        return np.asarray(fetch(texts), dtype=EMBEDDING_DTYPE)
+
+    found = cache.get_many(model, texts)
+    missing = [t for t in dict.fromkeys(texts) if t not in found]
+    if missing:
+        fetched = np.asarray(fetch(missing))
+        cache.put_many(model, missing, fetched)
+        found.update(zip(missing, fetched))
+    if not texts:
+        return np.empty((0, 0), dtype=EMBEDDING_DTYPE)
+    return np.stack([found[t] for t in texts]).astype(EMBEDDING_DTYPE, copy=False)
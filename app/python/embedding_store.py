@@ -0,0 +1,162 @@
+import os
+import json
+import mmap
+import numpy as np
+
+MAGIC = b"EMBSTORE"
+STORE_VERSION = 1
+# Rows start one page into the file, so the memory-mapped matrix is page aligned
+HEADER_BYTES = 4096
+CHUNK_ROWS = 20000
+
+
+class EmbeddingStore:
+    """Embedding rows in one file: a JSON header, then a row-major matrix.
+
+    The header records the model name, the embedding dimension, the row
+    count, the storage dtype and free-form ``meta``. Rows are only ever
+    appended, and a row's ID is its position. Reads go through a read-only
+    memory map, so ``array()`` and ``iter_chunks`` hand out views of the file
+    without copying it into memory. Only the pages a caller touches are read.
+
+    A store can be passed wherever a chunked consumer takes an embedding
+    matrix: ``fit_projection``, ``ProjectionBasis.transform``,
+    ``sweep_kmeans`` and ``fit_kmeans_chunked`` read it chunk by chunk
+    through ``iter_row_chunks`` and index it for samples.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an embedding store")
+            length = int.from_bytes(f.read(4), "little")
+            header = json.loads(f.read(length))
+        if header.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported embedding store version {header.get('version')} in {path}")
+        self.model = header["model"]
+        self.dim = header["dim"]
+        self.dtype = np.dtype(header["dtype"])
+        self.meta = header.get("meta") or {}
+        self.rows = header["rows"]
+        self._array = None
+
+    @classmethod
+    def create(cls, path, model, dim, dtype=np.float32, meta=None):
+        """Start an empty store at ``path``, replacing any file already there."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(encode_header(model, dim, 0, np.dtype(dtype), meta))
+        return cls(path)
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def shape(self):
+        return (self.rows, self.dim)
+
+    @property
+    def row_bytes(self):
+        return self.dim * self.dtype.itemsize
+
+    def append(self, vectors):
+        """Write ``vectors`` after the last row and return their IDs.
+
+        The rows are written before the header's count is raised, so a
+        store interrupted mid-append still reads as its previous rows.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected rows of dimension {self.dim}, got shape {vectors.shape}")
+        start = self.rows
+        with open(self.path, "r+b") as f:
+            f.seek(HEADER_BYTES + start * self.row_bytes)
+            vectors.tofile(f)
+            f.flush()
+            f.seek(0)
+            f.write(encode_header(self.model, self.dim, start + len(vectors), self.dtype, self.meta))
+        self.rows = start + len(vectors)
+        # The next read maps the longer file; views already handed out keep the old map alive
+        self._array = None
+        return np.arange(start, self.rows)
+
+    def array(self):
+        """The whole matrix as a read-only view of the memory-mapped file."""
+        if self._array is None:
+            if self.rows == 0:
+                self._array = np.empty((0, self.dim), dtype=self.dtype)
+            else:
+                with open(self.path, "rb") as f:
+                    self._mmap = mmap.mmap(f.fileno(), HEADER_BYTES + self.rows * self.row_bytes,
+                                           access=mmap.ACCESS_READ)
+                self._array = np.ndarray((self.rows, self.dim), dtype=self.dtype, buffer=self._mmap,
+                                         offset=HEADER_BYTES)
+        return self._array
+
+    def __array__(self, dtype=None, copy=None):
+        return self.array() if dtype is None else self.array().astype(dtype)
+
+    def __getitem__(self, key):
+        """A slice is a view of the file. Any other key copies its rows out, as array indexing does.
+
+        Those rows are read from the file one at a time rather than through
+        the memory map, where readahead around scattered rows would fault in
+        most of the file.
+        """
+        if isinstance(key, slice):
+            return self.array()[key]
+        ids = np.arange(self.rows)[key]
+        out = np.empty((ids.size, self.dim), dtype=self.dtype)
+        with open(self.path, "rb") as f:
+            for i, row in enumerate(ids.reshape(-1).tolist()):
+                out[i] = np.frombuffer(os.pread(f.fileno(), self.row_bytes, HEADER_BYTES + row * self.row_bytes),
+                                       dtype=self.dtype)
+        return out.reshape(ids.shape + (self.dim,))
+
+    def get(self, ids):
+        """The rows with the given IDs, as a float32 array."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) and (ids.min() < 0 or ids.max() >= self.rows):
+            raise IndexError(f"Row IDs must be in [0, {self.rows})")
+        return self[ids].astype(np.float32)
+
+    def release(self, start=0, stop=None):
+        """Drop the pages of rows ``start`` to ``stop`` from this process; they stay in the page cache."""
+        advice = getattr(mmap, "MADV_DONTNEED", None)
+        if advice is None or self._array is None or not self.rows:
+            return
+        stop = self.rows if stop is None else min(stop, self.rows)
+        begin = (HEADER_BYTES + start * self.row_bytes) // mmap.PAGESIZE * mmap.PAGESIZE
+        self._mmap.madvise(advice, begin, HEADER_BYTES + stop * self.row_bytes - begin)
+
+    def iter_chunks(self, chunk_rows=CHUNK_ROWS):
+        """Yield ``(start, rows)`` views of ``chunk_rows`` rows at a time.
+
+        Once the caller moves on, the pages of the chunk it had are dropped
+        from this process, so a full pass keeps resident memory near one
+        chunk however large the file is. They stay in the page cache.
+        """
+        array = self.array()
+        for start in range(0, self.rows, chunk_rows):
+            yield start, array[start:start + chunk_rows]
+            self.release(start, start + chunk_rows)
+
+
+def encode_header(model, dim, rows, dtype, meta):
+    header = json.dumps({
+        "version": STORE_VERSION, "model": model, "dim": int(dim), "rows": int(rows),
+        "dtype": dtype.str, "meta": meta or {},
+    }).encode("utf-8")
+    if len(MAGIC) + 4 + len(header) > HEADER_BYTES:
+        raise ValueError("Embedding store header does not fit in HEADER_BYTES")
+    return (MAGIC + len(header).to_bytes(4, "little") + header).ljust(HEADER_BYTES, b" ")
+
+
+def iter_row_chunks(embeddings, chunk_rows=CHUNK_ROWS):
+    """Yield ``(start, rows)`` over an array, memory map or EmbeddingStore, ``chunk_rows`` rows at a time."""
+    if isinstance(embeddings, EmbeddingStore):
+        yield from embeddings.iter_chunks(chunk_rows)
+        return
+    for start in range(0, len(embeddings), chunk_rows):
+        yield start, embeddings[start:start + chunk_rows]
@@ -1,50 +1,39 @@
 import numpy as np
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
-import requests
-from sklearn.metrics import silhouette_score
 
+import os
 import json
 import sys
+import uuid
+import hashlib
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from embedding_cache import cached_embeddings, get_default_cache
+from embedding_backends import get_backend, HuggingFaceAPIBackend
+from embedding_store import EmbeddingStore, CHUNK_ROWS
+import progress
+
+OUTPUT_FORMATS = ("json", "npy")
+SIDECAR_DTYPES = ("float16", "float32")
+K_SWEEPS = ("kmeans", "bisecting")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, stream=sys.stderr,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-API_URL = "https://api-inference.huggingface.co/pipeline/feature-extraction/sentence-transformers/all-MiniLM-L6-v2"
-
 
 def get_embeddings(texts: List[str], huggingface_api_key: str) -> np.ndarray:
-    """Fetch embeddings from Hugging Face API using a user-provided API key."""
+    """Embed texts with the configured backend, skipping those already in the local cache."""
     try:
-        if not huggingface_api_key:
-            raise ValueError("Missing Hugging Face API key from user input")
-
-        headers = {"Authorization": f"Bearer {huggingface_api_key}"}
-
+        backend = get_backend(hf_api_key=huggingface_api_key)
         texts = [str(text) for text in texts]
-        logging.info(f"Getting embeddings for {len(texts)} texts")
-
-        payload = {"inputs": texts, "options": {"wait_for_model": True}}
+        logging.info(f"Getting embeddings for {len(texts)} texts with the {backend.name} backend")
 
-        logging.info("Making request to Hugging Face API")
-        response = requests.post(
-            API_URL,
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()
-
-        embeddings = np.array(response.json())
-        logging.info(f"Initial embeddings shape: {embeddings.shape}")
-
-        if embeddings.ndim == 3:
-            embeddings = np.mean(embeddings, axis=1)
-            logging.info(f"After pooling, embeddings shape: {embeddings.shape}")
+        embeddings = cached_embeddings(texts, backend.cache_key, backend.embed)
+        logging.info(f"Embeddings shape: {embeddings.shape}")
 
+        cache = get_default_cache()
+        if cache is not None:
+            logging.info(f"Embedding cache stats: {cache.stats()}")
         return embeddings
 
     except Exception as e:
@@ -52,15 +41,159 @@ def get_embeddings(texts: List[str], huggingface_api_key: str) -> np.ndarray:
         raise
 
 
-def extract_concepts_with_embeddings(input_data: List[Dict[str, Any]], user_api_keys: Dict[str, str]) -> List[Dict[str, Any]]:
-    """Extracts concepts by clustering text responses based on Hugging Face embeddings."""
+def embed_into_store(path: str, texts: List[str], model: str, huggingface_api_key: str) -> EmbeddingStore:
+    """Embed ``texts`` into the EmbeddingStore at ``path``, one CHUNK_ROWS batch at a time.
+
+    A store already at ``path`` is reused when it holds ``model`` embeddings
+    of exactly these texts, so a rerun over the same responses skips
+    embedding. Otherwise it is rebuilt, and only one batch is in memory.
+    """
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode("utf-8") + b"\0")
+    meta = {"texts": digest.hexdigest()}
+    if os.path.exists(path):
+        store = EmbeddingStore(path)
+        if store.model == model and store.meta == meta and len(store) == len(texts):
+            logging.info(f"Reusing {len(store)} embeddings from {path}")
+            return store
+
+    tmp_path = f"{path}.tmp"
+    store = None
+    for start in range(0, len(texts), CHUNK_ROWS):
+        vectors = get_embeddings(texts[start:start + CHUNK_ROWS], huggingface_api_key)
+        if store is None:
+            store = EmbeddingStore.create(tmp_path, model, vectors.shape[1], meta=meta)
+        store.append(vectors)
+    os.replace(tmp_path, path)
+    return EmbeddingStore(path)
+
+
+def write_sidecar(path: str, array: np.ndarray, dtype: str, rows: Optional[np.ndarray] = None) -> None:
+    """Save ``array[rows]`` (all of ``array`` by default) as ``dtype`` to an .npy file.
+
+    Rows are copied a chunk at a time, and any previous file is replaced
+    atomically.
+    """
+    tmp_path = f"{path}.tmp.npy"
+    rows = np.arange(len(array)) if rows is None else rows
+    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=(len(rows),) + array.shape[1:])
+    for start in range(0, len(rows), CHUNK_ROWS):
+        out[start:start + CHUNK_ROWS] = array[rows[start:start + CHUNK_ROWS]]
+    out.flush()
+    del out
+    os.replace(tmp_path, path)
+
+
+def load_sidecar(ref: Dict[str, Any], mmap_mode: Optional[str] = "r") -> np.ndarray:
+    """Rows of an .npy sidecar described by ``{"path", "shape", "offset"}``, memory-mapped by default."""
+    array = np.load(ref["path"], mmap_mode=mmap_mode)
+    return array[ref["offset"]:ref["offset"] + ref["shape"][0]]
+
+
+def encode_demographics(demographics_list: List[Any]):
+    """Encode each row's demographics as integer codes for "category:value" keys.
+
+    Returns ``(rows, codes, keys)``: one (row, code) pair per key a row
+    contributes, in row order and then dict order, and ``keys[code]`` the key
+    string. A list value contributes one pair per element, and a row that is
+    not a dict contributes "default:<row>".
+
+    Rows are formatted from ``np.array(demographics_list)``, as the old
+    per-cluster loop did. The route sends ``string[]`` demographics, and
+    equal-length lists become rows of a 2D string array, so their keys keep
+    numpy's "default:['woman' 'asian']" form. Ragged lists, which that
+    conversion rejects, fall back to an object array and Python's list repr.
+    """
+    try:
+        demographics = np.array(demographics_list)
+    except ValueError:
+        demographics = np.empty(len(demographics_list), dtype=object)
+        for i, demog in enumerate(demographics_list):
+            demographics[i] = demog
+    key_codes = {}
+    rows, codes = [], []
+    for row, demog in enumerate(demographics):
+        if isinstance(demog, dict):
+            for category, value in demog.items():
+                for v in (value if isinstance(value, list) else [value]):
+                    rows.append(row)
+                    codes.append(key_codes.setdefault(f"{category}:{v}", len(key_codes)))
+        else:
+            rows.append(row)
+            codes.append(key_codes.setdefault(f"default:{demog}", len(key_codes)))
+    return np.array(rows, dtype=np.int64), np.array(codes, dtype=np.int64), list(key_codes)
+
+
+def demographic_distributions(labels: np.ndarray, n_clusters: int, rows: np.ndarray, codes: np.ndarray,
+                              keys: List[str]) -> List[Dict[str, int]]:
+    """Count each key per cluster with one bincount over (cluster, code) pairs.
+
+    Each cluster's dict lists its keys in the order they first occur among
+    its rows, as counting them row by row would.
+    """
+    n_codes = len(keys)
+    pairs = labels[rows] * n_codes + codes
+    counts = np.bincount(pairs, minlength=n_clusters * n_codes)
+    present, first = np.unique(pairs, return_index=True)
+    present = present[np.lexsort((first, present // n_codes))]
+    distributions = [{} for _ in range(n_clusters)]
+    for pair in present.tolist():
+        distributions[pair // n_codes][keys[pair % n_codes]] = int(counts[pair])
+    return distributions
+
+
+def extract_concepts_with_embeddings(input_data: List[Dict[str, Any]], user_api_keys: Dict[str, str],
+                                     silhouette_sample_size: Optional[int] = None,
+                                     max_workers: Optional[int] = None, output_format: str = "json",
+                                     output_dtype: str = "float32",
+                                     output_dir: Optional[str] = None,
+                                     projection_path: Optional[str] = None,
+                                     projection_mode: str = "fit",
+                                     projection_solver: str = "auto",
+                                     embedding_store_path: Optional[str] = None,
+                                     k_sweep: str = "kmeans") -> List[Dict[str, Any]]:
+    """Extracts concepts by clustering text responses based on sentence embeddings.
+
+    The cluster count (4 to 14) is chosen by silhouette. Identical responses
+    are embedded and clustered once, weighted by their count, then copied
+    back to every row in input order.
+
+    silhouette_sample_size: rows scored per k (default SILHOUETTE_SAMPLE_SIZE).
+    max_workers: processes for the ``sweep_kmeans`` fits.
+    output_format: "json" lists, or "npy" sidecars read with ``load_sidecar``.
+    output_dtype: dtype of the .npy sidecars.
+    output_dir: where "npy" writes its sidecars; required for it, and the caller deletes them.
+    projection_path: .npz file the ``fit_projection`` basis is saved to or read from.
+    projection_mode: "fit" a new basis, or "project" with the one at projection_path.
+    projection_solver: ``fit_projection`` solver.
+    embedding_store_path: EmbeddingStore file to embed into and reuse (see ``embed_into_store``).
+    k_sweep: "kmeans" for ``sweep_kmeans`` or "bisecting" for ``sweep_bisecting``.
+    """
+    # Imported here rather than at module level to keep script start-up cheap
+    from sklearn.cluster import KMeans
+    from clustering_sweep import sweep_kmeans, sweep_bisecting, SILHOUETTE_SAMPLE_SIZE
+    from projection import ProjectionBasis, fit_projection
+
+    if silhouette_sample_size is None:
+        silhouette_sample_size = SILHOUETTE_SAMPLE_SIZE
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Expected one of: {', '.join(OUTPUT_FORMATS)}")
+    if output_dtype not in SIDECAR_DTYPES:
+        raise ValueError(f"Unsupported output dtype '{output_dtype}'. Expected one of: {', '.join(SIDECAR_DTYPES)}")
+    if output_format == "npy" and not output_dir:
+        raise ValueError("output_format 'npy' needs an output_dir, whose files the caller removes")
+    if k_sweep not in K_SWEEPS:
+        raise ValueError(f"Unknown k sweep '{k_sweep}'. Expected one of: {', '.join(K_SWEEPS)}")
+
     try:
         logging.info(f"Starting concept extraction with {len(input_data)} items")
 
-        if "huggingface" not in user_api_keys or not user_api_keys["huggingface"]:
+        huggingface_api_key = user_api_keys.get("huggingface")
+        backend = get_backend(hf_api_key=huggingface_api_key)
+        if backend.name == HuggingFaceAPIBackend.name and not huggingface_api_key:
             raise ValueError("Missing Hugging Face API key in user input")
 
-        huggingface_api_key = user_api_keys["huggingface"]
         responses = []
         demographics_list = []
 
@@ -75,72 +208,113 @@ def extract_concepts_with_embeddings(input_data: List[Dict[str, Any]], user_api_
         if len(responses) < 2:
             raise Exception("Need at least 2 responses for clustering")
 
-        embeddings = get_embeddings(responses, huggingface_api_key)
-
-        n_components = min(embeddings.shape[1], len(responses) - 1, 2)
-        pca = PCA(n_components=n_components)
-        pca_coordinates = pca.fit_transform(embeddings)
-
-        if pca_coordinates.shape[1] == 1:
-            pca_coordinates = np.column_stack([pca_coordinates, np.zeros(len(responses))])
-        elif pca_coordinates.shape[1] > 2:
-            pca_coordinates = pca_coordinates[:, :2]
-
-        if pca_coordinates.shape[1] != 2:
+        # Identical responses (placeholders, deterministic answers) are embedded
+        # and clustered once, weighted by how often they occur
+        unique_index = {}
+        inverse = np.array([unique_index.setdefault(text, len(unique_index)) for text in map(str, responses)])
+        unique_responses = list(unique_index)
+        counts = np.bincount(inverse)
+        logging.info(f"{len(unique_responses)} distinct responses out of {len(responses)}")
+
+        # float32 from here on: PCA, KMeans and silhouette all keep it
+        with progress.stage("embedding"):
+            if embedding_store_path:
+                unique_embeddings = embed_into_store(embedding_store_path, unique_responses, backend.cache_key,
+                                                     huggingface_api_key)
+            else:
+                unique_embeddings = get_embeddings(unique_responses, huggingface_api_key)
+
+        with progress.stage("projection"):
+            if projection_mode == "project" and projection_path and os.path.exists(projection_path):
+                basis = ProjectionBasis.load(projection_path)
+                if basis.embedding_key != backend.cache_key:
+                    raise ValueError(
+                        f"Projection was fitted on '{basis.embedding_key}' embeddings, not '{backend.cache_key}'"
+                    )
+            else:
+                basis = fit_projection(unique_embeddings, counts, n_components=2, solver=projection_solver,
+                                       embedding_key=backend.cache_key)
+                if projection_path:
+                    basis.save(projection_path)
+            logging.info(f"2D projection from the {basis.solver} solver")
+            unique_coordinates = basis.transform(unique_embeddings)
+        explained_variance = basis.explained_variance_ratio
+        if unique_coordinates.shape[1] < 2:
+            unique_coordinates = np.column_stack([
+                unique_coordinates,
+                np.zeros((len(unique_responses), 2 - unique_coordinates.shape[1]), dtype=unique_coordinates.dtype),
+            ])
+
+        if unique_coordinates.shape[1] != 2:
             raise Exception("Failed to generate 2D PCA coordinates")
 
-        explained_variance = pca.explained_variance_ratio_
         print(f"PCA explained variance ratios: {explained_variance}", file=sys.stderr)
 
         # Find the best number of clusters using Silhouette Score
-        n_clusters = 4
-        best_score = -1
-
-        for k in range(4, min(len(responses), 15)):
-            kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-            labels = kmeans.fit_predict(embeddings)
-            score = silhouette_score(embeddings, labels)
-
-            if score > best_score:
-                best_score = score
-                n_clusters = k
-
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        cluster_labels = kmeans.fit_predict(embeddings)
+        with progress.stage("kmeans_sweep"):
+            k_values = range(4, min(len(unique_responses), 15))
+            if len(k_values):
+                if k_sweep == "bisecting":
+                    sweep, n_clusters, unique_labels = sweep_bisecting(
+                        unique_embeddings, k_values, sample_size=silhouette_sample_size, weights=counts,
+                    )
+                else:
+                    sweep, n_clusters, unique_labels = sweep_kmeans(
+                        unique_embeddings, k_values, sample_size=silhouette_sample_size, max_workers=max_workers,
+                        weights=counts,
+                    )
+                logging.info(f"Silhouette by k: {[(r['k'], r['silhouette']) for r in sweep]}")
+            else:
+                n_clusters = min(4, len(unique_responses))
+                unique_labels = KMeans(n_clusters=n_clusters, random_state=42, n_init=10).fit_predict(
+                    unique_embeddings, sample_weight=counts
+                )
+
+        # Broadcast back so every original row keeps its own position and demographics
+        cluster_labels = unique_labels[inverse]
+
+        if output_format == "npy":
+            os.makedirs(output_dir, exist_ok=True)
+            run_id = uuid.uuid4().hex
+            order = np.argsort(cluster_labels, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(cluster_labels, minlength=n_clusters))])
+            sidecars = {}
+            for name, array in (("embeddings", unique_embeddings), ("coordinates", unique_coordinates)):
+                path = os.path.abspath(os.path.join(output_dir, f"{name}-{run_id}.npy"))
+                write_sidecar(path, array, output_dtype, rows=inverse[order])
+                sidecars[name] = path
+            logging.info(f"Wrote {output_dtype} embeddings and coordinates to {output_dir}")
+
+        distributions = demographic_distributions(cluster_labels, n_clusters, *encode_demographics(demographics_list))
 
         cluster_concepts = []
         for i in range(n_clusters):
             cluster_mask = cluster_labels == i
             cluster_responses = np.array(responses)[cluster_mask]
-            cluster_embeddings = embeddings[cluster_mask]
-            cluster_coordinates = pca_coordinates[cluster_mask]
-            cluster_demographics = np.array(demographics_list)[cluster_mask]
-
-            distribution = {}
-            for demog in cluster_demographics:
-                if isinstance(demog, dict):
-                    for category, value in demog.items():
-                        if isinstance(value, list):
-                            for v in value:
-                                key = f"{category}:{v}"
-                                distribution[key] = distribution.get(key, 0) + 1
-                        else:
-                            key = f"{category}:{value}"
-                            distribution[key] = distribution.get(key, 0) + 1
-                else:
-                    key = f"default:{demog}"
-                    distribution[key] = distribution.get(key, 0) + 1
+            cluster_rows = inverse[cluster_mask]
+            cluster_coordinates = unique_coordinates[cluster_rows]
 
             if cluster_coordinates.shape[1] != 2:
                 raise Exception(f"Invalid PCA coordinates shape: {cluster_coordinates.shape}")
 
+            size = int(np.sum(cluster_mask))
+            if output_format == "npy":
+                offset = int(offsets[i])
+                embeddings_out = {"path": sidecars["embeddings"], "shape": [size, unique_embeddings.shape[1]],
+                                  "dtype": output_dtype, "offset": offset}
+                coordinates_out = {"path": sidecars["coordinates"], "shape": [size, 2],
+                                   "dtype": output_dtype, "offset": offset}
+            else:
+                embeddings_out = np.asarray(unique_embeddings[cluster_rows], dtype=np.float32).tolist()
+                coordinates_out = cluster_coordinates.tolist()
+
             cluster_concepts.append({
                 "cluster_id": int(i),
-                "size": int(np.sum(cluster_mask)),
+                "size": size,
                 "representative_responses": cluster_responses.tolist(),
-                "distribution": distribution,
-                "embeddings": cluster_embeddings.tolist(),
-                "coordinates": cluster_coordinates.tolist()
+                "distribution": distributions[i],
+                "embeddings": embeddings_out,
+                "coordinates": coordinates_out
             })
 
         logging.info("Successfully completed concept extraction")
@@ -167,7 +341,17 @@ if __name__ == "__main__":
 
         logging.info(f"Received {len(results)} items")
 
-        result = extract_concepts_with_embeddings(results, user_api_keys)
+        result = extract_concepts_with_embeddings(
+            results, user_api_keys, silhouette_sample_size=input_data.get("silhouetteSampleSize"),
+            output_format=input_data.get("outputFormat", "json"),
+            output_dtype=input_data.get("outputDtype", "float32"),
+            output_dir=input_data.get("outputDir"),
+            projection_path=input_data.get("projectionPath"),
+            projection_mode=input_data.get("projectionMode", "fit"),
+            projection_solver=input_data.get("projectionSolver", "auto"),
+            embedding_store_path=input_data.get("embeddingStorePath"),
+            k_sweep=input_data.get("kSweep", "kmeans"),
+        )
 
         print(json.dumps(result))
         sys.stdout.flush()
@@ -0,0 +1,97 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+import progress
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HuggingFaceEmbeddingClient:
+    """Feature-extraction client that splits large inputs into chunks.
+
+    Chunks of ``chunk_size`` texts are posted over one pooled session with at
+    most ``max_in_flight`` requests outstanding, and the results are stacked
+    back in input order. A 503 while the model loads is retried after the
+    ``estimated_time`` the API reports; other transient failures (429, 5xx,
+    connection errors, timeouts) back off exponentially from ``backoff``
+    seconds. Waits are capped at ``max_wait`` and a chunk is given up on
+    after ``max_retries`` retries.
+    """
+
+    def __init__(self, api_url, api_key, chunk_size=64, max_in_flight=4, timeout=60,
+                 max_retries=5, backoff=1.0, max_wait=60.0, session=None):
+        self.api_url = api_url
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_in_flight, pool_maxsize=max_in_flight)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        session.headers.update({"Authorization": f"Bearer {api_key}"})
+        self.session = session
+
+    def embed(self, texts):
+        texts = [str(t) for t in texts]
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        if not chunks:
+            return np.empty((0, 0), dtype=np.float32)
+        logging.info(f"Requesting {len(texts)} embeddings in {len(chunks)} chunks")
+        if len(chunks) == 1:
+            return self.post_chunk(chunks[0])
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(chunks))) as pool:
+            # map yields results in submission order, whatever order chunks finish in
+            results = []
+            for result in pool.map(self.post_chunk, chunks):
+                results.append(result)
+                progress.advance(len(results), len(chunks))
+            return np.vstack(results)
+
+    def post_chunk(self, chunk):
+        payload = {"inputs": chunk, "options": {"wait_for_model": True}}
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = self.session.post(self.api_url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                wait = self.backoff * 2 ** attempt
+                logging.warning(f"Embedding request failed ({e}); retrying in {wait:.1f}s")
+                time.sleep(min(wait, self.max_wait))
+                continue
+
+            if resp.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                wait = self.retry_delay(resp, attempt)
+                logging.warning(f"Embedding request returned {resp.status_code}; retrying in {wait:.1f}s")
+                time.sleep(wait)
+                continue
+
+            resp.raise_for_status()
+            # Parse straight to float32 rather than building a float64 copy first
+            embs = np.array(resp.json(), dtype=np.float32)
+            # pool token embeddings if returned as [batch, tokens, dim]
+            if embs.ndim == 3:
+                embs = embs.mean(axis=1)
+            return embs
+
+    def retry_delay(self, resp, attempt):
+        wait = self.backoff * 2 ** attempt
+        if resp.status_code == 503:
+            try:
+                wait = float(resp.json().get("estimated_time", wait))
+            except (ValueError, AttributeError):
+                pass
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                wait = max(wait, float(retry_after))
+            except ValueError:
+                pass
+        return min(wait, self.max_wait)
@@ -1,28 +1,48 @@
 import numpy as np
 import json
 import sys
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-import nltk
+from functools import lru_cache
+import progress
 
-# Gensim libraries for coherence computation
-from gensim.models.coherencemodel import CoherenceModel
-from gensim import corpora
+# sklearn, gensim and the NLTK corpora are loaded on first use rather than at
+# import, so starting the script does not pay for them (or hit the network).
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords',
+}
 
-# Initialize NLTK
-nltk.download('punkt', quiet=True)
-nltk.download('stopwords', quiet=True)
+@lru_cache(maxsize=None)
+def ensure_nltk_data():
+    """Download the NLTK resources we need, but only the ones not already installed."""
+    import nltk
+    for package, resource in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            nltk.download(package, quiet=True)
+
+@lru_cache(maxsize=None)
+def english_stopwords():
+    from nltk.corpus import stopwords
+    ensure_nltk_data()
+    return frozenset(stopwords.words('english'))
 
 def clean_text(text):
-    stop_words = set(stopwords.words('english'))
+    from nltk.tokenize import word_tokenize
+    stop_words = english_stopwords()
     tokens = word_tokenize(text.lower())
     return ' '.join([t for t in tokens if t.isalpha() and t not in stop_words and len(t) > 2])
 
 def extract_topics(responses, candidate_topics=range(5, 12,2)):
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.decomposition import LatentDirichletAllocation
+    # Gensim libraries for coherence computation
+    from gensim.models.coherencemodel import CoherenceModel
+    from gensim import corpora
+
     # Clean texts and prepare tokenized texts for coherence computation
-    texts = [clean_text(res['text']) for res in responses]
+    with progress.stage("cleaning"):
+        texts = [clean_text(res['text']) for res in responses]
     tokenized_texts = [text.split() for text in texts]  
     
     # Build a dictionary and corpus for the coherence model
@@ -45,35 +65,38 @@ def extract_topics(responses, candidate_topics=range(5, 12,2)):
     best_topics_full = None
     
     # Grid search for the best number of topics based on coherence
-    for n_topics in candidate_topics:
-        lda = LatentDirichletAllocation(n_components=n_topics, random_state=42, max_iter=50, learning_method='batch')
-        doc_topics = lda.fit_transform(doc_term_matrix)
+    candidate_topics = list(candidate_topics)
+    with progress.stage("lda_grid"):
+        for done, n_topics in enumerate(candidate_topics, 1):
+            lda = LatentDirichletAllocation(n_components=n_topics, random_state=42, max_iter=50, learning_method='batch')
+            doc_topics = lda.fit_transform(doc_term_matrix)
         
-        topics = []
-        for i, topic in enumerate(lda.components_):
-            top_word_indices = topic.argsort()[:-11:-1] 
-            top_words = [feature_names[idx] for idx in top_word_indices]
-            topics.append(top_words)
+            topics = []
+            for i, topic in enumerate(lda.components_):
+                top_word_indices = topic.argsort()[:-11:-1] 
+                top_words = [feature_names[idx] for idx in top_word_indices]
+                topics.append(top_words)
         
-        coherence_model = CoherenceModel(topics=topics, texts=tokenized_texts, dictionary=dictionary, coherence='c_v')
-        coherence_score = coherence_model.get_coherence()
+            coherence_model = CoherenceModel(topics=topics, texts=tokenized_texts, dictionary=dictionary, coherence='c_v')
+            coherence_score = coherence_model.get_coherence()
         
-        if coherence_score > best_coherence:
-            best_coherence = coherence_score
-            best_model = lda
-            best_n_topics = n_topics
-            best_doc_topics = doc_topics
+            if coherence_score > best_coherence:
+                best_coherence = coherence_score
+                best_model = lda
+                best_n_topics = n_topics
+                best_doc_topics = doc_topics
             
-            topics_full = []
-            for i, topic in enumerate(lda.components_):
-                top_word_indices = topic.argsort()[:-11:-1]
-                top_words = [feature_names[idx] for idx in top_word_indices]
-                topic_weights = topic[top_word_indices].tolist()
-                total_weight = sum(topic_weights)
-                if total_weight > 0:
-                    topic_weights = [w / total_weight for w in topic_weights]
-                topics_full.append({ "topic_id": i, "words": top_words, "weights": topic_weights })
-            best_topics_full = topics_full
+                topics_full = []
+                for i, topic in enumerate(lda.components_):
+                    top_word_indices = topic.argsort()[:-11:-1]
+                    top_words = [feature_names[idx] for idx in top_word_indices]
+                    topic_weights = topic[top_word_indices].tolist()
+                    total_weight = sum(topic_weights)
+                    if total_weight > 0:
+                        topic_weights = [w / total_weight for w in topic_weights]
+                    topics_full.append({ "topic_id": i, "words": top_words, "weights": topic_weights })
+                best_topics_full = topics_full
+            progress.advance(done, len(candidate_topics))
 
     print("Selected number of topics:", best_n_topics, "with coherence:", best_coherence, file=sys.stderr)
 
@@ -0,0 +1,58 @@
+import numpy as np
+
+DEFAULT_MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def normalize_rows(embeddings, dtype=np.float32):
+    """L2-normalize rows so cosine similarity becomes a dot product."""
+    unit = np.asarray(embeddings, dtype=dtype).copy()
+    norms = np.linalg.norm(unit, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    unit /= norms
+    return unit
+
+
+def cosine_radius_graph(embeddings, eps, max_block_bytes=DEFAULT_MAX_BLOCK_BYTES):
+    """Sparse graph of cosine distances no greater than ``eps``.
+
+    Embeddings are normalized to float32 and compared a block of rows at a
+    time, with each block's distances and mask kept under ``max_block_bytes``,
+    so the dense n x n distance matrix is never built. The result is a CSR
+    matrix whose stored entries (explicit zeros included) are the neighbour
+    pairs, suitable for ``DBSCAN(metric='precomputed')``. Its size grows with
+    the number of neighbour pairs, so a very large ``eps`` still yields a
+    dense graph.
+    """
+    from scipy import sparse
+
+    unit = normalize_rows(embeddings)
+    n = unit.shape[0]
+    # Each row of a block holds n float32 distances, turned from similarities
+    # in place so no second temporary exists, plus a boolean mask
+    block_rows = max(1, int(max_block_bytes // max(1, n * 5)))
+
+    indptr = [np.zeros(1, dtype=np.int64)]
+    indices = []
+    data = []
+    nnz = 0
+    for start in range(0, n, block_rows):
+        block = unit[start:start + block_rows]
+        distances = block @ unit.T
+        np.subtract(1.0, distances, out=distances)
+        np.maximum(distances, 0.0, out=distances)
+        within = distances <= eps
+        rows, cols = np.nonzero(within)
+        indices.append(cols.astype(np.int32))
+        data.append(distances[rows, cols])
+        counts = np.bincount(rows, minlength=block.shape[0])
+        indptr.append(nnz + np.cumsum(counts))
+        nnz += len(cols)
+        # Free this block before the next product is allocated, not after
+        del distances, within
+
+    return sparse.csr_matrix(
+        (np.concatenate(data) if data else np.empty(0, dtype=np.float32),
+         np.concatenate(indices) if indices else np.empty(0, dtype=np.int32),
+         np.concatenate(indptr)),
+        shape=(n, n),
+    )
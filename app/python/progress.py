@@ -0,0 +1,111 @@
+"""Progress records for long-running analysis stages.
+
+Code wraps each stage in ``stage(name)`` and calls ``advance(done, total)``
+inside it. Every update becomes one record:
+
+    {"type": "progress", "stage": "kmeans_sweep", "fraction": 0.5,
+     "elapsed": 12.3, "eta": 12.3}
+
+``elapsed`` and ``eta`` are in seconds since the stage started. ``eta`` is
+null until some progress has been made. Records go to the current sink,
+never to stdout, so they cannot mix with a script's result. worker.py
+installs a sink that tags each record with the job id. A script run on its
+own writes NDJSON to the file descriptor named by PROGRESS_FD, if that is
+set. Without either, reporting does nothing.
+"""
+import os
+import json
+import time
+import threading
+import contextlib
+
+# Updates closer together than this are dropped, except a stage's first and last
+MIN_INTERVAL = 0.25
+
+_sink = None
+_stages = []
+_lock = threading.Lock()
+
+
+def fd_sink(fd):
+    """Sink writing one JSON line per record to an inherited file descriptor."""
+    stream = os.fdopen(fd, "w", buffering=1)
+
+    def write(record):
+        stream.write(json.dumps(record) + "\n")
+    return write
+
+
+@contextlib.contextmanager
+def progress_sink(sink):
+    """Send progress records to ``sink`` (a callable taking one dict) inside the block."""
+    global _sink
+    previous = _sink
+    _sink = sink
+    try:
+        yield
+    finally:
+        _sink = previous
+
+
+def emit(record):
+    sink = _sink
+    if sink is None:
+        return
+    with _lock:
+        try:
+            sink(record)
+        except (OSError, ValueError):
+            # A closed or broken progress channel must never fail the job itself
+            pass
+
+
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.last_emit = None
+        self.finished = False
+
+    def update(self, fraction, force=False):
+        now = time.perf_counter()
+        fraction = min(max(float(fraction), 0.0), 1.0)
+        if self.finished or (not force and self.last_emit is not None and now - self.last_emit < MIN_INTERVAL):
+            return
+        self.last_emit = now
+        self.finished = fraction >= 1.0
+        elapsed = now - self.start
+        eta = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+        emit({
+            "type": "progress",
+            "stage": self.name,
+            "fraction": round(fraction, 4),
+            "elapsed": round(elapsed, 3),
+            "eta": None if eta is None else round(eta, 3),
+        })
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Report the block as stage ``name``, starting at fraction 0 and ending at 1."""
+    current = Stage(name)
+    _stages.append(current)
+    current.update(0.0, force=True)
+    try:
+        yield current
+        current.update(1.0, force=True)
+    finally:
+        _stages.pop()
+
+
+def advance(done, total):
+    """Report ``done`` of ``total`` units finished in the innermost active stage, if any."""
+    if _stages and total:
+        _stages[-1].update(done / total, force=done >= total)
+
+
+if os.environ.get("PROGRESS_FD"):
+    try:
+        _sink = fd_sink(int(os.environ["PROGRESS_FD"]))
+    except (OSError, ValueError):
+        _sink = None
@@ -0,0 +1,188 @@
+import numpy as np
+from embedding_store import EmbeddingStore, iter_row_chunks
+from versioned_npz import save_versioned_npz, load_versioned_npz
+
+PROJECTION_VERSION = 1
+SOLVERS = ("auto", "covariance", "randomized", "incremental")
+PROJECTION_OPTIONS = {
+    # "auto" accumulates the covariance matrix in chunks up to this embedding width
+    "covariance_max_dim": 1000,
+    # Wider embeddings stream through IncrementalPCA when memory-mapped or at least this many bytes
+    "incremental_min_bytes": 256 * 1024 * 1024,
+    # and otherwise use a randomized SVD from this many rows
+    "randomized_min_rows": 5000,
+    "chunk_rows": 20000,
+}
+
+
+def flip_signs(components):
+    """sklearn's svd_flip convention: make the largest-magnitude loading of each component positive."""
+    signs = np.sign(components[np.arange(len(components)), np.abs(components).argmax(axis=1)])
+    signs[signs == 0] = 1
+    return components * signs[:, None]
+
+
+class ProjectionBasis:
+    """A fitted linear projection (PCA mean and components) that can be saved and reapplied.
+
+    ``embedding_key`` is the cache key of the embedding backend it was fitted on.
+    """
+
+    def __init__(self, mean, components, explained_variance_ratio, embedding_key=None, solver=None):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.explained_variance_ratio = np.asarray(explained_variance_ratio, dtype=np.float64)
+        self.embedding_key = embedding_key
+        self.solver = solver
+
+    def transform(self, embeddings, chunk_rows=None):
+        """Project rows onto the basis a chunk at a time, so memory-mapped input is never loaded whole."""
+        chunk_rows = chunk_rows or PROJECTION_OPTIONS["chunk_rows"]
+        out = np.empty((len(embeddings), len(self.components)), dtype=np.float32)
+        for start, chunk in iter_row_chunks(embeddings, chunk_rows):
+            chunk = np.asarray(chunk, dtype=np.float32)
+            out[start:start + chunk_rows] = (chunk - self.mean) @ self.components.T
+        return out
+
+    def save(self, path):
+        """Write the basis to an .npz file, replacing any previous version atomically."""
+        save_versioned_npz(
+            path, PROJECTION_VERSION, {"embedding_key": self.embedding_key, "solver": self.solver},
+            mean=self.mean, components=self.components, explained_variance_ratio=self.explained_variance_ratio,
+        )
+
+    @classmethod
+    def load(cls, path):
+        meta, arrays = load_versioned_npz(path, PROJECTION_VERSION, "projection")
+        return cls(arrays["mean"], arrays["components"], arrays["explained_variance_ratio"],
+                   embedding_key=meta["embedding_key"], solver=meta["solver"])
+
+
+def choose_solver(embeddings, options=None):
+    options = {**PROJECTION_OPTIONS, **(options or {})}
+    n_rows, dim = embeddings.shape
+    if dim <= options["covariance_max_dim"]:
+        return "covariance"
+    if isinstance(embeddings, (np.memmap, EmbeddingStore)) or embeddings.nbytes >= options["incremental_min_bytes"]:
+        return "incremental"
+    if n_rows >= options["randomized_min_rows"]:
+        return "randomized"
+    return "covariance"
+
+
+def fit_covariance(embeddings, weights, n_components, chunk_rows):
+    """Exact weighted PCA from the dim x dim covariance, accumulated over chunks of rows.
+
+    Rows are shifted by the first chunk's mean before accumulating, which
+    keeps float32 chunk products from cancelling when the shared mean
+    dominates the variance. Only one chunk is ever held as an array.
+    """
+    dim = embeddings.shape[1]
+    unit_weights = bool((weights == 1).all())
+    shift = np.asarray(embeddings[:chunk_rows], dtype=np.float32).mean(axis=0)
+    total_weight = 0.0
+    weighted_sum = np.zeros(dim)
+    scatter = np.zeros((dim, dim))
+    for start, chunk in iter_row_chunks(embeddings, chunk_rows):
+        chunk = np.asarray(chunk, dtype=np.float32) - shift
+        chunk_weights = weights[start:start + chunk_rows].astype(np.float32)
+        total_weight += chunk_weights.sum(dtype=np.float64)
+        weighted_sum += chunk_weights @ chunk
+        scatter += (chunk if unit_weights else chunk * chunk_weights[:, None]).T @ chunk
+
+    offset = weighted_sum / total_weight
+    covariance = (scatter - total_weight * np.outer(offset, offset)) / max(total_weight - 1, 1)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    eigenvalues = np.clip(eigenvalues[::-1], 0, None)
+    components = eigenvectors[:, ::-1][:, :n_components].T
+    total = eigenvalues.sum()
+    ratio = eigenvalues[:n_components] / total if total > 0 else np.zeros(n_components)
+    return shift + offset, components, ratio
+
+
+def fit_randomized(embeddings, weights, n_components, random_state):
+    """Weighted PCA from a randomized SVD of the sqrt(weight)-scaled, centred rows."""
+    from sklearn.utils.extmath import randomized_svd
+
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    mean = np.average(embeddings, axis=0, weights=weights).astype(np.float32)
+    scaled = embeddings - mean
+    scaled *= np.sqrt(weights, dtype=np.float32)[:, None]
+    _, singular_values, components = randomized_svd(
+        scaled, n_components, n_iter=7, random_state=random_state, flip_sign=False
+    )
+    total = float(np.einsum("ij,ij->", scaled, scaled, dtype=np.float64))
+    ratio = singular_values ** 2 / total if total > 0 else np.zeros(n_components)
+    return mean, components, ratio
+
+
+def weighted_batches(embeddings, weights, n_components, chunk_rows):
+    """Yield the rows, each repeated ``weights[i]`` times, in batches of ``chunk_rows`` repeated rows.
+
+    A heavy row is split across as many batches as it fills, so no batch
+    grows with the weights. partial_fit needs at least n_components rows per
+    call, so a shorter last batch is folded into the one before it.
+    """
+    total = int(weights.sum())
+    ends = list(range(chunk_rows, total, chunk_rows)) + [total]
+    if len(ends) > 1 and ends[-1] - ends[-2] < n_components:
+        del ends[-2]
+    batch, begin, position, parts = 0, 0, 0, []
+    for start, chunk in iter_row_chunks(embeddings, chunk_rows):
+        chunk = np.asarray(chunk, dtype=np.float32)
+        counts = weights[start:start + len(chunk)]
+        row_ends = position + np.cumsum(counts)
+        row_starts = row_ends - counts
+        position = int(row_ends[-1])
+        while begin < position:
+            stop = ends[batch]
+            # How many copies of each row fall inside [begin, stop)
+            repeats = np.clip(np.minimum(row_ends, stop) - np.maximum(row_starts, begin), 0, None)
+            parts.append(np.repeat(chunk, repeats, axis=0))
+            if stop > position:
+                break
+            yield np.concatenate(parts)
+            parts, begin, batch = [], stop, batch + 1
+
+
+def fit_incremental(embeddings, weights, n_components, chunk_rows):
+    """IncrementalPCA over batches of ``chunk_rows`` rows; a row with weight w is fed in w times."""
+    from sklearn.decomposition import IncrementalPCA
+
+    ipca = IncrementalPCA(n_components=n_components)
+    for batch in weighted_batches(embeddings, weights, n_components, chunk_rows):
+        ipca.partial_fit(batch)
+    return ipca.mean_, ipca.components_, ipca.explained_variance_ratio_
+
+
+def fit_projection(embeddings, weights=None, n_components=2, solver="auto", embedding_key=None,
+                   options=None, random_state=42):
+    """Fit a PCA basis to ``embeddings``, each row counted ``weights[i]`` times.
+
+    ``solver`` "covariance" eigendecomposes the weighted covariance matrix.
+    The matrix is accumulated over chunks of ``chunk_rows`` rows, so it is
+    exact, reads the data once and works on memory-mapped input or an
+    EmbeddingStore. It costs
+    dim^2 memory, so it suits MiniLM-sized embeddings. "randomized" takes a
+    randomized SVD of the centred rows. "incremental" streams chunks through
+    IncrementalPCA. "auto" chooses by width and size using
+    PROJECTION_OPTIONS (overridden by ``options``), the way sklearn prefers
+    its covariance solver for up to 1000 features. Component signs follow
+    sklearn's convention whatever the solver.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown projection solver '{solver}'. Expected one of: {', '.join(SOLVERS)}")
+    options = {**PROJECTION_OPTIONS, **(options or {})}
+    n_rows, dim = embeddings.shape
+    weights = np.ones(n_rows, dtype=np.int64) if weights is None else np.asarray(weights, dtype=np.int64)
+    if solver == "auto":
+        solver = choose_solver(embeddings, options)
+    n_components = min(n_components, dim, n_rows)
+
+    if solver == "covariance":
+        mean, components, ratio = fit_covariance(embeddings, weights, n_components, options["chunk_rows"])
+    elif solver == "randomized":
+        mean, components, ratio = fit_randomized(embeddings, weights, n_components, random_state)
+    else:
+        mean, components, ratio = fit_incremental(embeddings, weights, n_components, options["chunk_rows"])
+    return ProjectionBasis(mean, flip_signs(components), ratio, embedding_key=embedding_key, solver=solver)
@@ -0,0 +1,131 @@
+import unittest
+from unittest import mock
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+from sklearn.metrics import pairwise_distances
+from clustering_sweep import (
+    sweep_dbscan, choose_setting, sweep_kmeans, stratified_sample, weighted_silhouette, bisect_kmeans, sweep_bisecting,
+)
+
+
+class TestClusteringSweep(unittest.TestCase):
+    def test_sweep_scores_every_setting(self):
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(5, 32))
+        embeddings = np.repeat(centers, 20, axis=0) + 0.2 * rng.normal(size=(100, 32))
+        weights = rng.integers(1, 4, size=100)
+        grid = {"eps": [0.05, 0.2, 0.5], "min_samples": [2, 4], "min_freq_threshold": [3]}
+
+        results, best = sweep_dbscan(embeddings, weights, grid, min_clusters=4, max_clusters=8, max_workers=2)
+
+        self.assertEqual(len(results), 6)
+        self.assertEqual([(r["eps"], r["min_samples"]) for r in results],
+                         [(0.05, 2), (0.05, 4), (0.2, 2), (0.2, 4), (0.5, 2), (0.5, 4)])
+        self.assertIn(best, results)
+        self.assertEqual(best["n_clusters"], 5)
+        self.assertGreater(best["silhouette"], 0.5)
+
+    def test_choose_setting_prefers_eligible_results(self):
+        results = [
+            {"n_clusters": 2, "noise_fraction": 0.0, "silhouette": 0.9},
+            {"n_clusters": 6, "noise_fraction": 0.1, "silhouette": 0.4},
+            {"n_clusters": 6, "noise_fraction": 0.0, "silhouette": 0.4},
+            {"n_clusters": 7, "noise_fraction": 0.8, "silhouette": 0.7},
+        ]
+        self.assertIs(choose_setting(results, min_clusters=4, max_clusters=16), results[2])
+        self.assertIs(choose_setting(results, min_clusters=20, max_clusters=30), results[0])
+
+
+class TestKMeansSweep(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        centers = rng.normal(size=(6, 16))
+        self.embeddings = (np.repeat(centers, 30, axis=0) + 0.3 * rng.normal(size=(180, 16))).astype(np.float32)
+
+    def test_full_sample_matches_refit_loop(self):
+        results, best_k, labels = sweep_kmeans(self.embeddings, range(4, 9), sample_size=1000, max_workers=1)
+
+        scores = []
+        for k in range(4, 9):
+            reference = KMeans(n_clusters=k, random_state=42, n_init=10).fit_predict(self.embeddings)
+            scores.append(silhouette_score(self.embeddings, reference))
+        expected_k = 4 + int(np.argmax(scores))
+
+        self.assertEqual([r["k"] for r in results], [4, 5, 6, 7, 8])
+        np.testing.assert_allclose([r["silhouette"] for r in results], scores, rtol=1e-4)
+        self.assertEqual(best_k, expected_k)
+        np.testing.assert_array_equal(
+            labels, KMeans(n_clusters=expected_k, random_state=42, n_init=10).fit_predict(self.embeddings)
+        )
+
+    def test_parallel_fits_match_serial(self):
+        serial = sweep_kmeans(self.embeddings, [4, 6], sample_size=50, max_workers=1)
+        with mock.patch("clustering_sweep.KMEANS_PARALLEL_MIN_ROWS", 0):
+            parallel = sweep_kmeans(self.embeddings, [4, 6], sample_size=50, max_workers=2)
+        self.assertEqual(serial[0], parallel[0])
+        self.assertEqual(serial[1], parallel[1])
+        np.testing.assert_array_equal(serial[2], parallel[2])
+
+    def test_weighted_silhouette_matches_repeated_rows(self):
+        rng = np.random.default_rng(2)
+        labels = rng.integers(0, 4, size=60)
+        labels[0] = 4  # a singleton cluster
+        counts = rng.integers(1, 4, size=60)
+        counts[0] = 1
+        expected = silhouette_score(np.repeat(self.embeddings[:60], counts, axis=0), np.repeat(labels, counts))
+
+        score = weighted_silhouette(pairwise_distances(self.embeddings[:60]), labels, counts)
+        self.assertAlmostEqual(score, expected, places=5)
+
+    def test_stratified_sample_covers_every_label(self):
+        labels = np.array([0] * 90 + [1] * 9 + [2])
+        sample = stratified_sample(labels, 20)
+        self.assertEqual(len(np.unique(sample)), len(sample))
+        self.assertEqual(set(labels[sample]), {0, 1, 2})
+        self.assertEqual(np.bincount(labels[sample]).tolist(), [18, 2, 1])
+        np.testing.assert_array_equal(stratified_sample(labels, 500), np.arange(100))
+
+
+
+class TestBisectingSweep(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        centers = 4 * rng.normal(size=(6, 16))
+        self.truth = np.repeat(np.arange(6), 30)
+        self.embeddings = (centers[self.truth] + 0.3 * rng.normal(size=(180, 16))).astype(np.float32)
+
+    def test_partitions_are_nested(self):
+        fits = bisect_kmeans(self.embeddings, range(2, 10))
+        self.assertEqual(len(fits), 8)
+        for k, (labels, _) in zip(range(2, 10), fits):
+            self.assertEqual(len(np.unique(labels)), k)
+        for (coarse, coarse_inertia), (fine, fine_inertia) in zip(fits, fits[1:]):
+            # Every finer cluster sits inside one coarser cluster, and splitting never adds inertia
+            self.assertEqual(len(set(zip(fine.tolist(), coarse.tolist()))), len(np.unique(fine)))
+            self.assertLessEqual(fine_inertia, coarse_inertia)
+
+    def test_inertia_matches_labels(self):
+        counts = np.random.default_rng(3).integers(1, 4, size=len(self.embeddings))
+        for labels, inertia in bisect_kmeans(self.embeddings, [3, 6], weights=counts):
+            expected = 0.0
+            for label in np.unique(labels):
+                rows = self.embeddings[labels == label].astype(np.float64)
+                centre = np.average(rows, axis=0, weights=counts[labels == label])
+                expected += float(counts[labels == label] @ ((rows - centre) ** 2).sum(axis=1))
+            self.assertAlmostEqual(inertia, expected, delta=1e-4 * expected)
+
+    def test_sweep_recovers_the_clusters(self):
+        results, best_k, labels = sweep_bisecting(self.embeddings, range(4, 9), sample_size=1000)
+        self.assertEqual([r["k"] for r in results], [4, 5, 6, 7, 8])
+        self.assertEqual(best_k, 6)
+        self.assertEqual(len(set(zip(labels.tolist(), self.truth.tolist()))), 6)
+        self.assertAlmostEqual(results[2]["silhouette"], silhouette_score(self.embeddings, labels), places=4)
+
+    def test_stops_when_nothing_can_be_split(self):
+        fits = bisect_kmeans(self.embeddings[:3], range(2, 6))
+        self.assertEqual(len(fits), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
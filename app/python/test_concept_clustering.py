@@ -1,6 +1,12 @@
+import os
+import tempfile
 import unittest
 from collections import Counter
-from concept_clustering import cluster_concepts
+from unittest import mock
+import numpy as np
+import concept_clustering
+from cluster_model import ClusterModel
+from concept_clustering import cluster_concepts, process_clustering, merge_small_clusters, ConceptVocabulary, demographic_cluster_totals, expand_compact_output, kmeans_labels
 import warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -52,5 +58,170 @@ class TestConceptClustering(unittest.TestCase):
         expected_demo_total = sum(freq for _, freq in demographics["group1"])
         self.assertEqual(demo_total, expected_demo_total)
 
+
+def fake_embeddings(texts, hf_api_key=None):
+    # Deterministic per-text vectors: concepts sharing a first letter sit close together.
+    vectors = []
+    for text in texts:
+        rng = np.random.default_rng(sum(map(ord, text)))
+        base = np.zeros(8)
+        base[ord(text[0]) % 8] = 1.0
+        vectors.append(base + 0.01 * rng.normal(size=8))
+    return np.array(vectors, dtype=np.float32)
+
+
+@mock.patch.object(concept_clustering, "normalize_concept", lambda c: c.lower())
+@mock.patch.object(concept_clustering, "get_embeddings", fake_embeddings)
+class TestWeightedClustering(unittest.TestCase):
+    concepts = [("apple", 7), ("avocado", 3), ("banana", 5), ("blueberry", 2),
+                ("cherry", 4), ("cranberry", 1), ("date", 6), ("durian", 2), ("Apple", 1)]
+
+    def test_weighted_matches_expanded(self):
+        weighted = process_clustering(self.concepts, weighted=True)
+        expanded = process_clustering(self.concepts, weighted=False)
+        self.assertEqual(weighted, expanded)
+
+    def test_frequencies_preserved(self):
+        clusters, concept_to_cluster = process_clustering(self.concepts)
+        total = sum(cluster["total_frequency"] for cluster in clusters)
+        self.assertEqual(total, sum(freq for _, freq in self.concepts))
+        apple = clusters[concept_to_cluster["apple"]]
+        self.assertEqual(apple["frequency"][apple["concepts"].index("apple")], 8)
+
+    def test_hierarchical_engine_respects_cluster_bounds(self):
+        total = sum(freq for _, freq in self.concepts)
+        for min_clusters, max_clusters in [(2, 3), (4, 16), (6, 8)]:
+            clusters, _ = process_clustering(self.concepts, engine="hierarchical",
+                                             min_clusters=min_clusters, max_clusters=max_clusters)
+            self.assertGreaterEqual(len(clusters), min_clusters)
+            self.assertLessEqual(len(clusters), max_clusters)
+            self.assertEqual(sum(cluster["total_frequency"] for cluster in clusters), total)
+
+    def test_hierarchical_engine_falls_back_above_row_limit(self):
+        with mock.patch.object(concept_clustering, "HIERARCHICAL_MAX_ROWS", 4), \
+                mock.patch.object(concept_clustering, "hierarchical_clusters") as hierarchical:
+            clusters = process_clustering(self.concepts, engine="hierarchical")
+        hierarchical.assert_not_called()
+        self.assertEqual(clusters, process_clustering(self.concepts, engine="dbscan"))
+
+    def test_compact_output_expands_to_default_shape(self):
+        demographics = {"group1": [("apple", 2), ("cherry", 1)], "group2": [("date", 3)]}
+        default = cluster_concepts({"all": self.concepts, "demographics": demographics})
+        compact = cluster_concepts({"all": self.concepts, "demographics": demographics, "outputFormat": "compact"})
+
+        self.assertEqual(compact["format"], "compact")
+        self.assertEqual(len(compact["demographics"]["group1"]), len(compact["all"]))
+        self.assertEqual(expand_compact_output(compact), default)
+
+    def test_sweep_mode_embeds_once(self):
+        calls = []
+
+        def counting_embeddings(texts, hf_api_key=None):
+            calls.append(len(texts))
+            return fake_embeddings(texts, hf_api_key)
+
+        grid = {"eps": [0.1, 0.3], "min_samples": [1, 2], "min_freq_threshold": [1]}
+        with mock.patch.object(concept_clustering, "get_embeddings", counting_embeddings):
+            swept = cluster_concepts({"all": self.concepts, "demographics": {}, "mode": "sweep", "sweepGrid": grid})
+
+        self.assertEqual(calls, [8])
+        self.assertEqual(len(swept["sweep"]["results"]), 4)
+        with self.assertRaises(ValueError):
+            process_clustering(self.concepts, embeddings=np.zeros((3, 8)))
+
+    def test_saved_assign_threshold_follows_swept_eps(self):
+        grid = {"eps": [0.1], "min_samples": [1], "min_freq_threshold": [1]}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            model_path = os.path.join(tmpdir, "clusters.npz")
+            cluster_concepts({"all": self.concepts, "demographics": {}, "mode": "sweep", "sweepGrid": grid,
+                              "clusterModelPath": model_path})
+            model = ClusterModel.load(model_path)
+        self.assertEqual(model.params["eps"], 0.1)
+        self.assertAlmostEqual(model.params["assign_threshold"], 0.9)
+
+    def test_assign_mode_keeps_cluster_ids(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            model_path = os.path.join(tmpdir, "clusters.npz")
+            fitted = cluster_concepts({"all": self.concepts, "demographics": {}, "clusterModelPath": model_path})
+            updated = cluster_concepts({
+                "all": [("apricot", 3), ("banana", 1), ("elderberry", 4), ("eggplant", 2)],
+                "demographics": {"group1": [("apricot", 3), ("eggplant", 2)]},
+                "clusterModelPath": model_path,
+                "mode": "assign",
+            })
+
+        before = {cluster["id"]: cluster for cluster in fitted["all"]}
+        after = {cluster["id"]: cluster for cluster in updated["all"]}
+        apple_id = next(cid for cid, cluster in before.items() if "apple" in cluster["concepts"])
+        self.assertIn("apricot", after[apple_id]["concepts"])
+        self.assertEqual(after[apple_id]["total_frequency"], before[apple_id]["total_frequency"] + 3)
+        self.assertEqual(after[apple_id]["label"], before[apple_id]["label"])
+        new_ids = set(after) - set(before)
+        self.assertEqual(len(new_ids), 1)
+        self.assertEqual(set(after[new_ids.pop()]["concepts"]), {"elderberry", "eggplant"})
+        demo_totals = {c["id"]: c["total_frequency"] for c in updated["demographics"]["group1"]}
+        self.assertEqual(demo_totals[apple_id], 3)
+
+
+class TestKMeansLabels(unittest.TestCase):
+    def test_minibatch_path_above_threshold(self):
+        rng = np.random.default_rng(0)
+        centers = np.eye(4) * 10
+        embeddings = np.repeat(centers, 50, axis=0) + rng.normal(size=(200, 4))
+        weights = np.ones(200)
+
+        import sklearn.cluster
+        with mock.patch.object(sklearn.cluster, "MiniBatchKMeans", wraps=sklearn.cluster.MiniBatchKMeans) as minibatch:
+            full = kmeans_labels(embeddings, weights, 4)
+            self.assertFalse(minibatch.called)
+            mini = kmeans_labels(embeddings, weights, 4, minibatch_threshold=100, batch_size=32)
+            self.assertTrue(minibatch.called)
+
+        # Both recover the four blobs, up to label permutation
+        for labels in (full, mini):
+            self.assertEqual(len(set(labels.reshape(4, 50).max(axis=1))), 4)
+            self.assertTrue(all(len(set(block)) == 1 for block in labels.reshape(4, 50)))
+
+
+class TestConceptVocabulary(unittest.TestCase):
+    @mock.patch.object(concept_clustering, "normalize_concept", side_effect=lambda c: c.lower().rstrip("s"))
+    def test_ids_are_shared_and_normalized_once(self, normalize):
+        vocabulary = ConceptVocabulary()
+        first = vocabulary.normalize(["Walks", "walk", "sleep", "Walks"])
+        second = vocabulary.normalize(["sleep", "diet", "walk"])
+
+        self.assertEqual(first.tolist(), [0, 0, 1, 0])
+        self.assertEqual(second.tolist(), [1, 2, 0])
+        self.assertEqual(vocabulary.concepts, ["walk", "sleep", "diet"])
+        self.assertEqual(normalize.call_count, 6)
+
+    @mock.patch.object(concept_clustering, "normalize_concept", lambda c: c.lower())
+    def test_demographic_cluster_totals(self):
+        vocabulary = ConceptVocabulary()
+        vocabulary.normalize(["walk", "run", "sleep"])
+        concept_to_cluster = {"walk": 0, "run": 0, "sleep": 1}
+        groups = [[("Walk", 2), ("sleep", 1), ("unknown", 5)], [], [("run", 4), ("walk", 1)]]
+
+        totals = demographic_cluster_totals(groups, vocabulary, concept_to_cluster, n_clusters=2)
+
+        self.assertEqual(totals.tolist(), [[2, 1], [0, 0], [5, 0]])
+
+
+class TestMergeSmallClusters(unittest.TestCase):
+    def test_small_clusters_and_noise_join_nearest(self):
+        embeddings = np.array([[1.0, 0.0], [1.0, 0.1], [0.0, 1.0], [0.1, 1.0], [0.9, 0.1], [0.2, 1.0]])
+        weights = np.array([3, 3, 3, 3, 1, 1])
+        clusters_dict = {0: [0, 1], 1: [2, 3], -1: [4], 2: [5]}
+
+        merged = merge_small_clusters(clusters_dict, embeddings, weights, min_freq_threshold=3)
+
+        self.assertEqual(list(merged.keys()), [0, 1])
+        self.assertEqual(sorted(merged[0]), [0, 1, 4])
+        self.assertEqual(sorted(merged[1]), [2, 3, 5])
+
+    def test_single_cluster_is_kept(self):
+        merged = merge_small_clusters({-1: [0]}, np.ones((1, 2)), np.array([1]), min_freq_threshold=3)
+        self.assertEqual(merged, {-1: [0]})
+
 if __name__ == '__main__':
     unittest.main()
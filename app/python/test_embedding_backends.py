@@ -0,0 +1,28 @@
+import os
+import unittest
+from unittest import mock
+from embedding_backends import get_backend, HuggingFaceAPIBackend, LocalBackend
+
+
+class TestGetBackend(unittest.TestCase):
+    @mock.patch.dict(os.environ, {}, clear=True)
+    def test_defaults_to_huggingface(self):
+        backend = get_backend(hf_api_key="key")
+        self.assertIsInstance(backend, HuggingFaceAPIBackend)
+        self.assertEqual(backend.cache_key, "sentence-transformers/all-MiniLM-L6-v2")
+
+    @mock.patch.dict(os.environ, {"EMBEDDING_BACKEND": "local", "EMBEDDING_BATCH_SIZE": "16", "EMBEDDING_QUANTIZE": "1"}, clear=True)
+    def test_local_from_environment(self):
+        backend = get_backend()
+        self.assertIsInstance(backend, LocalBackend)
+        self.assertEqual(backend.batch_size, 16)
+        self.assertTrue(backend.quantize)
+        self.assertEqual(backend.cache_key, "sentence-transformers/all-MiniLM-L6-v2@local-int8")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_backend("gpu-farm")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from embedding_cache import EmbeddingCache, cached_embeddings
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = EmbeddingCache(os.path.join(self.tmpdir.name, "cache.sqlite3"))
+        self.fetched = []
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def fetch(self, texts):
+        self.fetched.append(list(texts))
+        return np.array([[len(t), ord(t[0])] for t in texts], dtype=float)
+
+    def test_fetches_only_missing_texts(self):
+        first = cached_embeddings(["a", "bb", "a"], "model", self.fetch, cache=self.cache)
+        second = cached_embeddings(["bb", "ccc", "a"], "model", self.fetch, cache=self.cache)
+
+        self.assertEqual(self.fetched, [["a", "bb"], ["ccc"]])
+        np.testing.assert_array_equal(first, [[1, 97], [2, 98], [1, 97]])
+        np.testing.assert_array_equal(second, [[2, 98], [3, 99], [1, 97]])
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_models_are_separate(self):
+        cached_embeddings(["a"], "model-1", self.fetch, cache=self.cache)
+        cached_embeddings(["a"], "model-2", self.fetch, cache=self.cache)
+        self.assertEqual(self.fetched, [["a"], ["a"]])
+
+    def test_lru_eviction(self):
+        vector = np.zeros(4)  # 32 bytes per entry
+        self.cache.max_bytes = 64
+        self.cache.put_many("model", ["old"], [vector])
+        self.cache.put_many("model", ["recent"], [vector])
+        self.cache.get_many("model", ["old"])
+        self.cache.put_many("model", ["new"], [vector])
+
+        remaining = self.cache.get_many("model", ["old", "recent", "new"])
+        self.assertEqual(set(remaining), {"old", "new"})
+        self.assertLessEqual(self.cache.size_bytes(), 64)
+
+    def test_float16_storage_returns_float32(self):
+        cache = EmbeddingCache(":memory:", store_dtype="float16")
+        try:
+            first = cached_embeddings(["a", "bb"], "model", self.fetch, cache=cache)
+            second = cached_embeddings(["bb", "a"], "model", self.fetch, cache=cache)
+            self.assertEqual(cache.size_bytes(), 2 * 2 * 2)
+        finally:
+            cache.close()
+        self.assertEqual(first.dtype, np.float32)
+        self.assertEqual(second.dtype, np.float32)
+        np.testing.assert_array_equal(second, [[2, 98], [1, 97]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import clustering_sweep
+import embeddings_extractor
+from embedding_store import EmbeddingStore, iter_row_chunks
+from projection import fit_projection
+from clustering_sweep import fit_kmeans_chunked, sweep_kmeans, bisect_kmeans
+
+
+def blobs(n=600, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = 10 * rng.normal(size=(4, dim))
+    truth = np.arange(n) % 4
+    return (centers[truth] + rng.normal(size=(n, dim))).astype(np.float32), truth
+
+
+class TestEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "embeddings.store")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_append_reopen_and_read_by_id(self):
+        store = EmbeddingStore.create(self.path, "test-model", 3, meta={"run": 1})
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.array().shape, (0, 3))
+        first = np.arange(6, dtype=np.float32).reshape(2, 3)
+        second = np.arange(6, 15, dtype=np.float32).reshape(3, 3)
+        np.testing.assert_array_equal(store.append(first), [0, 1])
+        np.testing.assert_array_equal(store.append(second), [2, 3, 4])
+
+        reopened = EmbeddingStore(self.path)
+        self.assertEqual((reopened.model, reopened.dim, len(reopened), reopened.meta), ("test-model", 3, 5, {"run": 1}))
+        np.testing.assert_array_equal(reopened.get([4, 0]), np.stack([second[2], first[0]]))
+        np.testing.assert_array_equal(reopened.array(), np.vstack([first, second]))
+        with self.assertRaises(IndexError):
+            reopened.get([5])
+        with self.assertRaises(ValueError):
+            reopened.append(np.zeros((1, 4)))
+
+    def test_float16_store_reads_back_float32(self):
+        store = EmbeddingStore.create(self.path, "test-model", 4, dtype=np.float16)
+        store.append(np.full((2, 4), 0.5))
+        self.assertEqual(store.get([1]).dtype, np.float32)
+        self.assertEqual(os.path.getsize(self.path), 4096 + 2 * 4 * 2)
+
+    def test_chunks_cover_every_row(self):
+        embeddings, _ = blobs(n=250)
+        store = EmbeddingStore.create(self.path, "test-model", embeddings.shape[1])
+        store.append(embeddings)
+        starts = []
+        for start, chunk in iter_row_chunks(store, 64):
+            starts.append(start)
+            np.testing.assert_array_equal(chunk, embeddings[start:start + 64])
+        self.assertEqual(starts, [0, 64, 128, 192])
+
+    def test_projection_and_kmeans_read_the_store(self):
+        embeddings, truth = blobs()
+        store = EmbeddingStore.create(self.path, "test-model", embeddings.shape[1])
+        store.append(embeddings)
+
+        basis = fit_projection(store, options={"chunk_rows": 100})
+        self.assertEqual(basis.solver, "covariance")
+        expected = fit_projection(embeddings, solver="covariance")
+        np.testing.assert_allclose(basis.transform(store, chunk_rows=100), expected.transform(embeddings), atol=1e-3)
+
+        labels, inertia = fit_kmeans_chunked(store, 4, chunk_rows=100)
+        self.assertEqual(len(set(zip(labels.tolist(), truth.tolist()))), 4)
+        self.assertGreater(inertia, 0)
+
+        with mock.patch.object(clustering_sweep, "CHUNKED_KMEANS_MIN_ROWS", 100):
+            results, best_k, best_labels = sweep_kmeans(store, range(2, 7), sample_size=200)
+        self.assertEqual(best_k, 4)
+        self.assertEqual(len(set(zip(best_labels.tolist(), truth.tolist()))), 4)
+
+    def test_bisecting_splits_large_store_clusters_in_chunks(self):
+        embeddings, truth = blobs()
+        store = EmbeddingStore.create(self.path, "test-model", embeddings.shape[1])
+        store.append(embeddings)
+
+        fitted_rows = []
+        original_fit = clustering_sweep.KMeans.fit
+
+        def recording_fit(kmeans, X, *args, **kwargs):
+            fitted_rows.append(len(X))
+            return original_fit(kmeans, X, *args, **kwargs)
+
+        with mock.patch.object(clustering_sweep, "CHUNKED_KMEANS_MIN_ROWS", 200), \
+                mock.patch.object(clustering_sweep.KMeans, "fit", recording_fit):
+            fits = bisect_kmeans(store, [2, 4])
+        # Only clusters below the threshold are read into memory for KMeans
+        self.assertTrue(all(rows < 200 for rows in fitted_rows))
+        labels, inertia = fits[-1]
+        self.assertEqual(len(set(zip(labels.tolist(), truth.tolist()))), 4)
+        self.assertGreater(inertia, 0)
+
+
+class TestExtractorStore(unittest.TestCase):
+    def test_store_is_reused_and_matches_in_memory_run(self):
+        calls = []
+
+        def fake_embeddings(texts, huggingface_api_key=None):
+            calls.append(len(texts))
+            rng = np.random.default_rng(0)
+            centers = rng.normal(size=(5, 16))
+            index = np.array([int(text.split()[-1]) for text in texts])
+            return (centers[index % 5] + 0.05 * rng.normal(size=(len(texts), 16))).astype(np.float32)
+
+        items = [{"response": f"response {i}", "demographics": {"group": "a" if i % 2 else "b"}} for i in range(60)]
+        keys = {"huggingface": "key"}
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                mock.patch.object(embeddings_extractor, "get_embeddings", fake_embeddings):
+            path = os.path.join(tmpdir, "run.store")
+            in_memory = embeddings_extractor.extract_concepts_with_embeddings(items, keys)
+            stored = embeddings_extractor.extract_concepts_with_embeddings(items, keys, embedding_store_path=path)
+            calls.clear()
+            rerun = embeddings_extractor.extract_concepts_with_embeddings(items, keys, embedding_store_path=path)
+
+        self.assertEqual(calls, [])
+        self.assertEqual(stored, rerun)
+        self.assertEqual([c["representative_responses"] for c in stored],
+                         [c["representative_responses"] for c in in_memory])
+        for a, b in zip(stored, in_memory):
+            np.testing.assert_allclose(a["embeddings"], b["embeddings"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import json
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import embeddings_extractor
+from embeddings_extractor import (
+    extract_concepts_with_embeddings, load_sidecar, encode_demographics, demographic_distributions,
+)
+
+
+def fake_embeddings(texts, huggingface_api_key=None):
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(5, 16))
+    return (centers[np.arange(len(texts)) % 5] + 0.05 * rng.normal(size=(len(texts), 16))).astype(np.float32)
+
+
+@mock.patch.object(embeddings_extractor, "get_embeddings", fake_embeddings)
+class TestSidecarOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.items = [{"response": f"response {i}", "demographics": {"group": "a" if i % 2 else "b"}} for i in range(60)]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_npy_output_matches_json_output(self):
+        keys = {"huggingface": "key"}
+        as_json = extract_concepts_with_embeddings(self.items, keys)
+        as_npy = extract_concepts_with_embeddings(self.items, keys, output_format="npy", output_dir=self.tmpdir.name)
+
+        self.assertEqual(len(as_json), len(as_npy))
+        for dense, compact in zip(as_json, as_npy):
+            self.assertEqual(dense["representative_responses"], compact["representative_responses"])
+            self.assertEqual(dense["distribution"], compact["distribution"])
+            self.assertEqual(compact["embeddings"]["shape"], [dense["size"], 16])
+            self.assertEqual(compact["coordinates"]["shape"], [dense["size"], 2])
+            embeddings = load_sidecar(compact["embeddings"])
+            self.assertIsInstance(embeddings, np.memmap)
+            np.testing.assert_array_equal(embeddings, np.array(dense["embeddings"], dtype=np.float32))
+            np.testing.assert_allclose(load_sidecar(compact["coordinates"]), dense["coordinates"], rtol=1e-6)
+        self.assertLess(len(json.dumps(as_npy)), len(json.dumps(as_json)) / 5)
+
+    def test_float16_sidecar(self):
+        result = extract_concepts_with_embeddings(
+            self.items, {"huggingface": "key"}, output_format="npy", output_dtype="float16", output_dir=self.tmpdir.name
+        )
+        embeddings = load_sidecar(result[0]["embeddings"])
+        self.assertEqual(embeddings.dtype, np.float16)
+        self.assertEqual(result[0]["embeddings"]["dtype"], "float16")
+
+    def test_rejects_unknown_format(self):
+        with self.assertRaises(ValueError):
+            extract_concepts_with_embeddings(self.items, {"huggingface": "key"}, output_format="arrow")
+        # Sidecars go only where the caller will clean them up
+        with self.assertRaises(ValueError):
+            extract_concepts_with_embeddings(self.items, {"huggingface": "key"}, output_format="npy")
+
+    def test_bisecting_k_sweep(self):
+        clusters = extract_concepts_with_embeddings(self.items, {"huggingface": "key"}, k_sweep="bisecting")
+        # fake_embeddings draws five tight groups
+        self.assertEqual(len(clusters), 5)
+        self.assertEqual(sorted(c["size"] for c in clusters), [12] * 5)
+        with self.assertRaises(ValueError):
+            extract_concepts_with_embeddings(self.items, {"huggingface": "key"}, k_sweep="agglomerative")
+
+
+class TestDeduplication(unittest.TestCase):
+    def test_duplicates_are_embedded_once_and_broadcast(self):
+        seen = []
+
+        def recording_embeddings(texts, huggingface_api_key=None):
+            seen.append(list(texts))
+            return fake_embeddings(texts)
+
+        items = []
+        for i in range(30):
+            items.append({"response": f"answer {i % 10}", "demographics": {"row": str(i)}})
+            items.append({"response": "Failed to get response", "demographics": {"row": f"failed {i}"}})
+
+        with mock.patch.object(embeddings_extractor, "get_embeddings", recording_embeddings):
+            clusters = extract_concepts_with_embeddings(items, {"huggingface": "key"})
+
+        self.assertEqual(len(seen), 1)
+        self.assertEqual(len(seen[0]), 11)
+        self.assertEqual(sum(cluster["size"] for cluster in clusters), len(items))
+
+        # Each original row appears once, with its own demographics
+        rows = sorted(key for cluster in clusters for key in cluster["distribution"])
+        self.assertEqual(rows, sorted(f"row:{item['demographics']['row']}" for item in items))
+        failed = [c for c in clusters if "Failed to get response" in c["representative_responses"]]
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(failed[0]["representative_responses"].count("Failed to get response"), 30)
+        for cluster in clusters:
+            embeddings = np.array(cluster["embeddings"])
+            self.assertEqual(embeddings.shape, (cluster["size"], 16))
+            self.assertEqual(len(cluster["coordinates"]), cluster["size"])
+
+
+class TestDemographicDistributions(unittest.TestCase):
+    @staticmethod
+    def count_rows(demographics, labels, cluster):
+        # The per-cluster loop demographic_distributions replaces, including its np.array step
+        distribution = {}
+        for demog in np.array(demographics)[labels == cluster]:
+            if isinstance(demog, dict):
+                for category, value in demog.items():
+                    for v in (value if isinstance(value, list) else [value]):
+                        distribution[f"{category}:{v}"] = distribution.get(f"{category}:{v}", 0) + 1
+            else:
+                distribution[f"default:{demog}"] = distribution.get(f"default:{demog}", 0) + 1
+        return distribution
+
+    def test_matches_row_by_row_counts(self):
+        rng = np.random.default_rng(0)
+        demographics = []
+        for i in range(500):
+            if i % 50 == 0:
+                demographics.append("Unknown")
+                continue
+            demog = {"age": str(rng.integers(18, 80) // 10 * 10), "region": ["north", "south", "east"][i % 3]}
+            if i % 4:
+                demog["language"] = [str(v) for v in rng.choice(["en", "fr", "de", "en"], size=rng.integers(0, 4))]
+            if i % 7 == 0:
+                demog = dict(reversed(list(demog.items())))
+            demographics.append(demog)
+        labels = rng.integers(0, 6, size=len(demographics))
+
+        distributions = demographic_distributions(labels, 7, *encode_demographics(demographics))
+
+        self.assertEqual(len(distributions), 7)
+        for cluster, distribution in enumerate(distributions):
+            expected = self.count_rows(demographics, labels, cluster)
+            self.assertEqual(distribution, expected)
+            self.assertEqual(list(distribution), list(expected))
+            self.assertTrue(all(type(count) is int for count in distribution.values()))
+
+    def test_string_list_demographics_keep_numpy_keys(self):
+        # The embeddings route sends each row's demographics as a string[]
+        demographics = [["woman", "asian"], ["man", "white"], ["woman", "asian"], ["woman", "black"]]
+        labels = np.array([0, 1, 0, 1])
+
+        distributions = demographic_distributions(labels, 2, *encode_demographics(demographics))
+
+        self.assertEqual(distributions[0], {"default:['woman' 'asian']": 2})
+        for cluster in range(2):
+            self.assertEqual(distributions[cluster], self.count_rows(demographics, labels, cluster))
+
+
+@mock.patch.object(embeddings_extractor, "get_embeddings", fake_embeddings)
+class TestSavedProjection(unittest.TestCase):
+    def test_project_mode_reuses_saved_basis(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f"{tmpdir}/projection.npz"
+            items = [{"response": f"response {i}"} for i in range(40)]
+            fitted = extract_concepts_with_embeddings(items, {"huggingface": "key"}, projection_path=path)
+
+            # Projecting a subset must not refit: the subset lands on the same coordinates
+            subset = extract_concepts_with_embeddings(
+                items[:20], {"huggingface": "key"}, projection_path=path, projection_mode="project"
+            )
+
+        by_response = {r: c for cluster in fitted
+                       for r, c in zip(cluster["representative_responses"], cluster["coordinates"])}
+        for cluster in subset:
+            for response, coordinates in zip(cluster["representative_responses"], cluster["coordinates"]):
+                np.testing.assert_allclose(coordinates, by_response[response], rtol=1e-5, atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
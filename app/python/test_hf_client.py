@@ -0,0 +1,95 @@
+import json
+import time
+import random
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import requests
+from hf_client import HuggingFaceEmbeddingClient
+
+
+class StubEmbeddingServer(ThreadingHTTPServer):
+    """Feature-extraction stand-in with injected latency and failures.
+
+    Each text embeds as [int(text), len(text)]. The first request for a chunk
+    answers 503 with an estimated_time and the second one 500, so every chunk
+    has to be retried twice before it succeeds.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.attempts = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.auth_headers = set()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        inputs = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["inputs"]
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.auth_headers.add(self.headers.get("Authorization"))
+            attempt = server.attempts.get(inputs[0], 0)
+            server.attempts[inputs[0]] = attempt + 1
+        try:
+            time.sleep(random.uniform(0.01, 0.05))
+            if attempt == 0:
+                self.send_json(503, {"error": "Model is currently loading", "estimated_time": 0.02})
+            elif attempt == 1:
+                self.send_json(500, {"error": "Internal error"})
+            else:
+                self.send_json(200, [[float(text), float(len(text))] for text in inputs])
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+class TestHuggingFaceEmbeddingClient(unittest.TestCase):
+    def setUp(self):
+        self.server = StubEmbeddingServer()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/embed"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_chunks_are_reassembled_in_order(self):
+        client = HuggingFaceEmbeddingClient(self.url, "key", chunk_size=7, max_in_flight=3, backoff=0.01)
+        texts = [str(i) for i in range(100)]
+
+        embeddings = client.embed(texts)
+
+        np.testing.assert_array_equal(embeddings[:, 0], np.arange(100))
+        self.assertEqual(len(self.server.attempts), 15)
+        self.assertTrue(all(count == 3 for count in self.server.attempts.values()))
+        self.assertLessEqual(self.server.max_in_flight, 3)
+        self.assertEqual(self.server.auth_headers, {"Bearer key"})
+
+    def test_gives_up_after_max_retries(self):
+        client = HuggingFaceEmbeddingClient(self.url, "key", chunk_size=10, max_retries=1, backoff=0.01)
+        with self.assertRaises(requests.HTTPError):
+            client.embed(["1", "2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+import importlib.util
+from unittest import mock
+import progress
+import lda_extractor
+
+
+@unittest.skipUnless(importlib.util.find_spec("gensim"), "gensim is not installed")
+class TestLDAProgress(unittest.TestCase):
+    def test_grid_reports_each_candidate(self):
+        words = ["apple", "banana", "cherry", "river", "mountain", "forest", "engine", "wheel", "road"]
+        responses = [{"text": " ".join(words[(i + j) % len(words)] for j in range(4)), "demographics": []}
+                     for i in range(30)]
+        records = []
+        # Tokenizing with NLTK is not what this test is about
+        with mock.patch.object(lda_extractor, "clean_text", lambda text: text), \
+                mock.patch.object(progress, "MIN_INTERVAL", 0), progress.progress_sink(records.append):
+            lda_extractor.extract_topics(responses, candidate_topics=[2, 3, 4])
+
+        grid = [r["fraction"] for r in records if r["stage"] == "lda_grid"]
+        self.assertEqual(grid, [0.0, 0.3333, 0.6667, 1.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import tracemalloc
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.metrics.pairwise import cosine_distances
+from neighbor_graph import cosine_radius_graph
+
+
+class TestCosineRadiusGraph(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(6, 16))
+        self.embeddings = np.repeat(centers, 10, axis=0) + 0.3 * rng.normal(size=(60, 16))
+        self.embeddings[5] = self.embeddings[4]  # duplicate rows sit at distance 0
+
+    def test_matches_dense_distances(self):
+        dense = cosine_distances(self.embeddings)
+        # A tiny block budget forces one row per block
+        graph = cosine_radius_graph(self.embeddings, eps=0.3, max_block_bytes=1)
+
+        expected = np.argwhere(dense <= 0.3)
+        self.assertEqual(graph.nnz, len(expected))
+        rows = np.repeat(np.arange(graph.shape[0]), np.diff(graph.indptr))
+        np.testing.assert_array_equal(np.column_stack([rows, graph.indices]), expected)
+        np.testing.assert_allclose(graph.data, dense[rows, graph.indices], atol=1e-5)
+
+    def test_dbscan_labels_match_cosine_metric(self):
+        weights = np.arange(60) % 3 + 1
+        expected = DBSCAN(eps=0.3, min_samples=4, metric='cosine').fit_predict(self.embeddings, sample_weight=weights)
+        graph = cosine_radius_graph(self.embeddings, eps=0.3)
+        labels = DBSCAN(eps=0.3, min_samples=4, metric='precomputed').fit_predict(graph, sample_weight=weights)
+        np.testing.assert_array_equal(labels, expected)
+
+    def test_blocks_stay_within_budget(self):
+        rng = np.random.default_rng(0)
+        embeddings = rng.normal(size=(4000, 16)).astype(np.float32)
+        budget = 2 * 1024 * 1024
+        cosine_radius_graph(embeddings[:10], eps=0.01)  # import scipy.sparse outside the trace
+
+        tracemalloc.start()
+        try:
+            cosine_radius_graph(embeddings, eps=0.01, max_block_bytes=budget)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # The budget plus the normalized copy of the embeddings (an eighth of it here)
+        self.assertLess(peak, 1.25 * budget)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from unittest import mock
+import progress
+
+
+class TestProgress(unittest.TestCase):
+    def test_stage_reports_fraction_elapsed_and_eta(self):
+        records = []
+        clock = iter([0.0, 0.0, 2.0, 2.1, 8.0, 9.0])
+        with mock.patch("progress.time.perf_counter", lambda: next(clock)), progress.progress_sink(records.append):
+            with progress.stage("embedding"):
+                progress.advance(1, 4)   # t=2.0
+                progress.advance(2, 4)   # t=2.1, inside MIN_INTERVAL: dropped
+                progress.advance(4, 4)   # t=8.0, final update always sent
+            # t=9.0 stage exit: already finished, nothing more
+
+        self.assertEqual([r["fraction"] for r in records], [0.0, 0.25, 1.0])
+        self.assertEqual(records[0]["eta"], None)
+        self.assertEqual(records[1], {"type": "progress", "stage": "embedding", "fraction": 0.25,
+                                      "elapsed": 2.0, "eta": 6.0})
+        self.assertEqual(records[2]["eta"], 0.0)
+
+    def test_nested_stages_and_no_sink(self):
+        records = []
+        with progress.progress_sink(records.append):
+            with progress.stage("clustering"):
+                with progress.stage("embedding"):
+                    progress.advance(1, 1)
+        self.assertEqual([(r["stage"], r["fraction"]) for r in records],
+                         [("clustering", 0.0), ("embedding", 0.0), ("embedding", 1.0), ("clustering", 1.0)])
+
+        # Without a sink, or outside any stage, reporting is a no-op
+        with progress.stage("quiet"):
+            progress.advance(1, 2)
+        progress.advance(1, 2)
+
+    def test_broken_sink_does_not_fail_the_job(self):
+        def broken(record):
+            raise OSError("pipe closed")
+
+        with progress.progress_sink(broken), progress.stage("work"):
+            progress.advance(1, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
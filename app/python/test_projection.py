@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+import tracemalloc
+import numpy as np
+from sklearn.decomposition import PCA
+from projection import ProjectionBasis, fit_projection, choose_solver, weighted_batches
+
+
+def sample_embeddings(n=400, dim=24, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(n, dim)).astype(np.float32)
+    embeddings[:, :2] *= [6, 3]
+    return embeddings
+
+
+class TestFitProjection(unittest.TestCase):
+    def test_solvers_match_pca_on_repeated_rows(self):
+        embeddings = sample_embeddings()
+        counts = np.random.default_rng(1).integers(1, 4, size=len(embeddings))
+        reference = PCA(n_components=2).fit(np.repeat(embeddings, counts, axis=0))
+        expected = reference.transform(embeddings)
+
+        # IncrementalPCA only approximates the batch decomposition
+        for solver, atol in (("covariance", 2e-3), ("randomized", 2e-3), ("incremental", 5e-2)):
+            with self.subTest(solver=solver):
+                basis = fit_projection(embeddings, counts, solver=solver, options={"chunk_rows": 64})
+                self.assertEqual(basis.solver, solver)
+                np.testing.assert_allclose(basis.transform(embeddings), expected, atol=atol)
+                np.testing.assert_allclose(basis.explained_variance_ratio, reference.explained_variance_ratio_,
+                                           atol=atol)
+
+    def test_auto_solver_choice(self):
+        options = {"covariance_max_dim": 4, "randomized_min_rows": 100, "incremental_min_bytes": 10 ** 6}
+        self.assertEqual(choose_solver(np.zeros((50000, 4), np.float32), options), "covariance")
+        self.assertEqual(choose_solver(np.zeros((50, 8), np.float32), options), "covariance")
+        self.assertEqual(choose_solver(np.zeros((500, 8), np.float32), options), "randomized")
+        self.assertEqual(choose_solver(np.zeros((50000, 8), np.float32), options), "incremental")
+
+    def test_chunked_solvers_read_memory_mapped_input(self):
+        embeddings = sample_embeddings(n=1000)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "embeddings.npy")
+            np.save(path, embeddings)
+            mapped = np.load(path, mmap_mode="r")
+            expected = PCA(n_components=2).fit_transform(embeddings)
+            for solver, atol in (("covariance", 2e-3), ("incremental", 5e-2)):
+                basis = fit_projection(mapped, solver=solver, options={"chunk_rows": 300})
+                np.testing.assert_allclose(basis.transform(mapped, chunk_rows=300), expected, atol=atol)
+            del mapped
+
+    def test_incremental_memory_is_bounded_by_chunk_rows(self):
+        embeddings = sample_embeddings(n=1000, dim=64)
+        counts = np.ones(len(embeddings), dtype=np.int64)
+        counts[10] = 200000  # one heavy placeholder, as deduplication produces
+
+        sizes = [len(batch) for batch in weighted_batches(embeddings, counts, 2, 500)]
+        self.assertEqual(sum(sizes), counts.sum())
+        self.assertLessEqual(max(sizes), 500 + 2)
+
+        tracemalloc.start()
+        try:
+            incremental = fit_projection(embeddings, counts, solver="incremental", options={"chunk_rows": 500})
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # Expanding the heavy row in one call would take 200000 * 64 * 4 bytes, about 51 MB
+        self.assertLess(peak, 5 * 1024 * 1024)
+        covariance = fit_projection(embeddings, counts, solver="covariance")
+        # 400 batches of one repeated row leave IncrementalPCA a little further from the exact fit
+        np.testing.assert_allclose(incremental.transform(embeddings), covariance.transform(embeddings), atol=1e-1)
+
+    def test_save_and_load(self):
+        embeddings = sample_embeddings()
+        basis = fit_projection(embeddings, embedding_key="model@local")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "projection.npz")
+            basis.save(path)
+            loaded = ProjectionBasis.load(path)
+        self.assertEqual(loaded.embedding_key, "model@local")
+        self.assertEqual(loaded.solver, "covariance")
+        np.testing.assert_array_equal(loaded.transform(embeddings), basis.transform(embeddings))
+
+
+if __name__ == '__main__':
+    unittest.main()
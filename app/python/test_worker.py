@@ -0,0 +1,53 @@
+import io
+import json
+import unittest
+from unittest import mock
+import numpy as np
+import worker
+import progress
+
+
+class TestWorker(unittest.TestCase):
+    def test_dispatches_and_keeps_stdout_clean(self):
+        def noisy_task(payload):
+            print("progress chatter")
+            return {"total": np.int64(payload["a"] + payload["b"]), "values": np.arange(2)}
+
+        stdin = io.StringIO('{"id": 7, "task": "add", "payload": {"a": 1, "b": 2}}\n\n{"id": 8, "task": "missing"}\n')
+        stdout = io.StringIO()
+        with mock.patch.dict(worker.TASKS, {"add": noisy_task}), \
+                mock.patch("sys.stdin", stdin), mock.patch("sys.stdout", stdout), \
+                mock.patch("sys.stderr", io.StringIO()):
+            worker.main()
+
+        responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(responses[0], {"id": 7, "result": {"total": 3, "values": [0, 1]}})
+        self.assertEqual(responses[1]["id"], 8)
+        self.assertIn("Unknown task", responses[1]["error"])
+        self.assertEqual(len(responses), 2)
+
+    def test_progress_lines_precede_result(self):
+        def staged_task(payload):
+            with progress.stage("work"):
+                for done in range(1, 4):
+                    progress.advance(done, 3)
+            return "ok"
+
+        stdin = io.StringIO('{"id": 3, "task": "staged", "payload": null}\n')
+        stdout = io.StringIO()
+        with mock.patch.dict(worker.TASKS, {"staged": staged_task}), \
+                mock.patch("sys.stdin", stdin), mock.patch("sys.stdout", stdout):
+            worker.main()
+
+        messages = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(messages[-1], {"id": 3, "result": "ok"})
+        updates = [m["progress"] for m in messages[:-1]]
+        self.assertTrue(all(m["id"] == 3 for m in messages))
+        self.assertEqual([u["stage"] for u in updates], ["work"] * len(updates))
+        self.assertEqual(updates[0]["fraction"], 0.0)
+        self.assertEqual(updates[-1]["fraction"], 1.0)
+        self.assertEqual(updates[-1]["eta"], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
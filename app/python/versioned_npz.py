@@ -0,0 +1,25 @@
+"""Saved models as .npz files: named arrays plus a JSON ``meta`` record carrying a format version."""
+import os
+import json
+import numpy as np
+
+
+def save_versioned_npz(path, version, meta, **arrays):
+    """Write ``arrays`` and ``meta`` (with ``version`` added) to ``path``, replacing any previous file atomically."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, meta=np.array(json.dumps({"version": version, **meta})), **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_versioned_npz(path, version, kind):
+    """Read ``(meta, arrays)`` back from ``path``, raising ValueError unless it was saved as ``version``.
+
+    ``kind`` names what the file holds in that error.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        arrays = {name: data[name] for name in data.files if name != "meta"}
+    if meta.get("version") != version:
+        raise ValueError(f"Unsupported {kind} version {meta.get('version')} in {path}")
+    return meta, arrays
@@ -0,0 +1,137 @@
+"""Long-lived analysis worker.
+
+Reads newline-delimited JSON jobs on stdin, one per line:
+
+    {"id": 1, "task": "cluster_concepts", "payload": {...}}
+
+and writes one line per job to stdout, either {"id": 1, "result": ...} or
+{"id": 1, "error": "..."}. Before that line, a job may write any number of
+{"id": 1, "progress": {"type": "progress", "stage": ..., "fraction": ...,
+"elapsed": ..., "eta": ...}} lines (see progress.py). Jobs run one at a
+time in arrival order; app/lib/python-worker.ts runs a pool of these
+processes for concurrency and kills one to time out or cancel its job. Task
+modules are imported on first use and then stay loaded, so later jobs skip
+interpreter start-up, heavy imports and NLTK corpus loading. Anything the
+tasks print to stdout is redirected to stderr to keep the protocol clean.
+
+Run with --preload to import every task module before the first job.
+"""
+import os
+import sys
+import json
+import traceback
+import threading
+import contextlib
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
+import progress
+
+
+def run_cluster_concepts(payload):
+    from concept_clustering import cluster_concepts
+    return cluster_concepts(payload)
+
+
+def run_extract_topics(payload):
+    from lda_extractor import extract_topics
+    return extract_topics(payload)
+
+
+def run_extract_concepts_with_embeddings(payload):
+    from embeddings_extractor import extract_concepts_with_embeddings
+    if not isinstance(payload, dict) or "results" not in payload or "userApiKeys" not in payload:
+        raise ValueError("Invalid input format. Expected keys: 'results' and 'userApiKeys'.")
+    return extract_concepts_with_embeddings(
+        payload["results"], payload["userApiKeys"], silhouette_sample_size=payload.get("silhouetteSampleSize"),
+        output_format=payload.get("outputFormat", "json"), output_dtype=payload.get("outputDtype", "float32"),
+        output_dir=payload.get("outputDir"), projection_path=payload.get("projectionPath"),
+        projection_mode=payload.get("projectionMode", "fit"), projection_solver=payload.get("projectionSolver", "auto"),
+        embedding_store_path=payload.get("embeddingStorePath"), k_sweep=payload.get("kSweep", "kmeans"),
+    )
+
+
+def run_calculate_agreement(payload):
+    from new_agreement_score import calculate_agreement_scores, NumpyJSONEncoder
+    results = calculate_agreement_scores((payload or {}).get("csvPath"))
+    return json.loads(json.dumps(results, cls=NumpyJSONEncoder))
+
+
+TASKS = {
+    "cluster_concepts": run_cluster_concepts,
+    "extract_topics": run_extract_topics,
+    "extract_concepts_with_embeddings": run_extract_concepts_with_embeddings,
+    "calculate_agreement": run_calculate_agreement,
+}
+
+PRELOAD_MODULES = ("concept_clustering", "lda_extractor", "embeddings_extractor", "new_agreement_score")
+# The task modules import these lazily; a preloading worker pays for them up front
+PRELOAD_DEPENDENCIES = (
+    "scipy.sparse", "scipy.cluster.hierarchy", "sklearn.cluster", "sklearn.decomposition",
+    "sklearn.metrics", "sklearn.feature_extraction.text", "nltk", "gensim",
+)
+
+
+def to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_write_lock = threading.Lock()
+
+
+def write_message(out, message):
+    with _write_lock:
+        out.write(json.dumps(message, default=to_json) + "\n")
+        out.flush()
+
+
+def handle(line, out=None):
+    """Run the job on one input line and return the response object.
+
+    Progress records raised while it runs are written to ``out`` as they
+    happen, tagged with the job id.
+    """
+    job_id = None
+    try:
+        job = json.loads(line)
+        job_id = job.get("id")
+        task = TASKS.get(job.get("task"))
+        if task is None:
+            raise ValueError(f"Unknown task '{job.get('task')}'. Expected one of: {', '.join(TASKS)}")
+        sink = None if out is None else (lambda record: write_message(out, {"id": job_id, "progress": record}))
+        with contextlib.redirect_stdout(sys.stderr), progress.progress_sink(sink):
+            result = task(job.get("payload"))
+        return {"id": job_id, "result": result}
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        return {"id": job_id, "error": str(e)}
+
+
+def preload():
+    for name in PRELOAD_MODULES + PRELOAD_DEPENDENCIES:
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                __import__(name)
+        except Exception as e:
+            print(f"Could not preload {name}: {e}", file=sys.stderr)
+
+
+def main():
+    if "--preload" in sys.argv[1:]:
+        preload()
+    out = sys.stdout
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        write_message(out, handle(line, out))
+
+
+if __name__ == "__main__":
+    main()
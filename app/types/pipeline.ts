@@ -143,6 +143,13 @@ export type ClusterOutput = {
   demographics: { [key: string]: ClusterData[] };
 };
 
+export type CompactClusterOutput = {
+  format: 'compact';
+  all: ClusterData[];
+  clusterIds: number[];
+  demographics: { [key: string]: number[] };
+};
+
 export interface LDAVisualizationsProps {
   ldaResults: LDAResult;
 }
@@ -87,9 +87,10 @@ def check_agreement(row, cluster_to_topic, cluster_to_pca, topic_to_pca):
     
     return cluster_topic_agree, cluster_pca_agree, topic_pca_agree
 
-def calculate_agreement_scores():
+def calculate_agreement_scores(csv_path=None):
     try:
-        csv_path = os.path.join(os.getcwd(), 'public', 'merged_analysis.csv')
+        if csv_path is None:
+            csv_path = os.path.join(os.getcwd(), 'public', 'merged_analysis.csv')
         
         if not os.path.exists(csv_path):
             raise FileNotFoundError(f"CSV file not found at {csv_path}")